@@ -4,14 +4,17 @@ Provides automatic state preservation and recovery with Git-based versioning
 """
 
 import os
-import json
-import hashlib
 import subprocess
+import threading
+from collections import ChainMap
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 
+from hashing import fingerprint
+from serialization import JSONDecodeError, dumpb, read_json, write_json
+
 
 @dataclass
 class Checkpoint:
@@ -23,6 +26,7 @@ class Checkpoint:
     changes: List[str]
     parent_id: Optional[str] = None
     git_commit_hash: Optional[str] = None
+    is_delta: bool = False  # state holds only keys changed since parent
 
 
 class CheckpointSystem:
@@ -30,6 +34,12 @@ class CheckpointSystem:
     Manages checkpoints with Git integration for prompt engineering
     """
 
+    # Checkpoints may be created from worker threads; creation reads and
+    # advances current_checkpoint, and git allows one commit at a time in a
+    # repository, so the lock is shared by every instance (main.py builds
+    # one per request)
+    _lock = threading.RLock()
+
     def __init__(self, checkpoint_dir: str = ".checkpoints"):
         """
         Initialize checkpoint system
@@ -51,7 +61,8 @@ class CheckpointSystem:
         state: Dict[str, Any],
         reasoning: str,
         changes: List[str],
-        auto_commit: bool = True
+        auto_commit: bool = True,
+        delta: bool = False
     ) -> Checkpoint:
         """
         Creates a new checkpoint
@@ -61,10 +72,63 @@ class CheckpointSystem:
             reasoning: Explanation of why this checkpoint was created
             changes: List of changes since last checkpoint
             auto_commit: Whether to automatically create a Git commit
+            delta: Whether state holds only the keys changed since the
+                current checkpoint (full state is materialized on restore)
 
         Returns:
             Created Checkpoint object
         """
+        with self._lock:
+            checkpoint = self._record_checkpoint(state, reasoning, changes, delta)
+
+            # Create Git commit if enabled
+            if self.git_enabled and auto_commit:
+                checkpoint.git_commit_hash = self._create_git_commit([checkpoint])
+
+        return checkpoint
+
+    def create_checkpoints_batch(
+        self,
+        entries: List[Dict[str, Any]],
+        auto_commit: bool = True
+    ) -> List[Checkpoint]:
+        """
+        Creates several checkpoints in order with a single Git commit
+
+        Args:
+            entries: Dicts with "state", "reasoning", "changes" and optional
+                "delta", as accepted by create_checkpoint
+            auto_commit: Whether to create one Git commit covering all entries
+
+        Returns:
+            Created Checkpoint objects, each parented on the previous one
+        """
+        with self._lock:
+            checkpoints = [
+                self._record_checkpoint(
+                    entry["state"],
+                    entry["reasoning"],
+                    entry["changes"],
+                    entry.get("delta", False)
+                )
+                for entry in entries
+            ]
+
+            if checkpoints and self.git_enabled and auto_commit:
+                commit_hash = self._create_git_commit(checkpoints)
+                for checkpoint in checkpoints:
+                    checkpoint.git_commit_hash = commit_hash
+
+        return checkpoints
+
+    def _record_checkpoint(
+        self,
+        state: Dict[str, Any],
+        reasoning: str,
+        changes: List[str],
+        delta: bool
+    ) -> Checkpoint:
+        """Builds a checkpoint on top of the current one, saves it and makes it current"""
         # Generate checkpoint ID
         checkpoint_id = self._generate_checkpoint_id(state)
 
@@ -75,17 +139,13 @@ class CheckpointSystem:
             state=state,
             reasoning=reasoning,
             changes=changes,
-            parent_id=self.current_checkpoint
+            parent_id=self.current_checkpoint,
+            is_delta=delta and self.current_checkpoint is not None
         )
 
         # Save checkpoint data
         self._save_checkpoint_data(checkpoint)
 
-        # Create Git commit if enabled
-        if self.git_enabled and auto_commit:
-            commit_hash = self._create_git_commit(checkpoint)
-            checkpoint.git_commit_hash = commit_hash
-
         # Store in memory
         self.checkpoints[checkpoint_id] = checkpoint
         self.current_checkpoint = checkpoint_id
@@ -105,10 +165,46 @@ class CheckpointSystem:
         if checkpoint_id not in self.checkpoints:
             raise ValueError(f"Checkpoint {checkpoint_id} not found")
 
-        checkpoint = self.checkpoints[checkpoint_id]
+        state = self.materialize_state(checkpoint_id)
         self.current_checkpoint = checkpoint_id
 
-        return checkpoint.state
+        return state
+
+    def materialize_state(self, checkpoint_id: str) -> Dict[str, Any]:
+        """
+        Rebuilds the full state of a checkpoint by applying deltas over
+        the nearest full-state ancestor
+
+        Args:
+            checkpoint_id: ID of checkpoint to materialize
+
+        Returns:
+            Full state dictionary
+        """
+        return dict(self.state_view(checkpoint_id))
+
+    def state_view(self, checkpoint_id: str) -> ChainMap:
+        """
+        Gets a read-only view of a checkpoint's full state without copying
+
+        The view chains the checkpoint's delta over its ancestors' states,
+        so values shared between checkpoints are stored once.
+
+        Args:
+            checkpoint_id: ID of checkpoint to view
+
+        Returns:
+            ChainMap resolving each key from the newest checkpoint holding it
+        """
+        chain = []
+        current = self.checkpoints.get(checkpoint_id)
+        while current:
+            chain.append(current.state)
+            if not current.is_delta:
+                break
+            current = self.checkpoints.get(current.parent_id)
+
+        return ChainMap(*chain)
 
     def get_checkpoint_history(self) -> List[Checkpoint]:
         """
@@ -207,20 +303,26 @@ class CheckpointSystem:
         except FileNotFoundError:
             return False
 
-    def _create_git_commit(self, checkpoint: Checkpoint) -> Optional[str]:
-        """Creates a Git commit for the checkpoint"""
+    def _create_git_commit(self, checkpoints: List[Checkpoint]) -> Optional[str]:
+        """Creates one Git commit covering the given checkpoints"""
         try:
-            # Add checkpoint file
-            checkpoint_file = self.checkpoint_dir / f"{checkpoint.checkpoint_id}.json"
+            # Add checkpoint files
             subprocess.run(
-                ["git", "add", str(checkpoint_file)],
+                ["git", "add"] + [
+                    str(self.checkpoint_dir / f"{checkpoint.checkpoint_id}.json")
+                    for checkpoint in checkpoints
+                ],
                 check=True,
                 capture_output=True
             )
 
             # Create commit message
-            commit_message = f"Checkpoint: {checkpoint.reasoning}\n\nChanges:\n"
-            commit_message += "\n".join([f"- {change}" for change in checkpoint.changes])
+            commit_message = "\n".join([
+                "Checkpoint: " + "; ".join(c.reasoning for c in checkpoints),
+                "",
+                "Changes:",
+                *(f"- {change}" for c in checkpoints for change in c.changes)
+            ])
 
             # Commit
             result = subprocess.run(
@@ -248,10 +350,9 @@ class CheckpointSystem:
 
     def _generate_checkpoint_id(self, state: Dict[str, Any]) -> str:
         """Generates a unique checkpoint ID from state"""
-        state_str = json.dumps(state, sort_keys=True)
+        state_bytes = dumpb(state, sort_keys=True)
         timestamp = datetime.now().isoformat()
-        combined = f"{state_str}{timestamp}"
-        return hashlib.sha256(combined.encode()).hexdigest()[:16]
+        return fingerprint(state_bytes, timestamp)[:16]
 
     def _save_checkpoint_data(self, checkpoint: Checkpoint):
         """Saves checkpoint data to file"""
@@ -264,11 +365,11 @@ class CheckpointSystem:
             "reasoning": checkpoint.reasoning,
             "changes": checkpoint.changes,
             "parent_id": checkpoint.parent_id,
-            "git_commit_hash": checkpoint.git_commit_hash
+            "git_commit_hash": checkpoint.git_commit_hash,
+            "is_delta": checkpoint.is_delta
         }
 
-        with open(checkpoint_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        write_json(checkpoint_file, data)
 
     def _load_checkpoints(self):
         """Loads existing checkpoints from disk"""
@@ -277,8 +378,7 @@ class CheckpointSystem:
 
         for checkpoint_file in self.checkpoint_dir.glob("*.json"):
             try:
-                with open(checkpoint_file, 'r') as f:
-                    data = json.load(f)
+                data = read_json(checkpoint_file)
 
                 checkpoint = Checkpoint(
                     checkpoint_id=data["checkpoint_id"],
@@ -287,7 +387,8 @@ class CheckpointSystem:
                     reasoning=data["reasoning"],
                     changes=data["changes"],
                     parent_id=data.get("parent_id"),
-                    git_commit_hash=data.get("git_commit_hash")
+                    git_commit_hash=data.get("git_commit_hash"),
+                    is_delta=data.get("is_delta", False)
                 )
 
                 self.checkpoints[checkpoint.checkpoint_id] = checkpoint
@@ -297,7 +398,7 @@ class CheckpointSystem:
                         checkpoint.timestamp > self.checkpoints[self.current_checkpoint].timestamp):
                     self.current_checkpoint = checkpoint.checkpoint_id
 
-            except (json.JSONDecodeError, KeyError):
+            except (JSONDecodeError, KeyError):
                 # Skip corrupted checkpoint files
                 continue
 
@@ -324,19 +425,17 @@ class CheckpointSystem:
         if not checkpoint:
             raise ValueError(f"Checkpoint {checkpoint_id} not found")
 
-        with open(output_path, 'w') as f:
-            json.dump({
-                "checkpoint_id": checkpoint.checkpoint_id,
-                "timestamp": checkpoint.timestamp,
-                "state": checkpoint.state,
-                "reasoning": checkpoint.reasoning,
-                "changes": checkpoint.changes
-            }, f, indent=2)
+        write_json(output_path, {
+            "checkpoint_id": checkpoint.checkpoint_id,
+            "timestamp": checkpoint.timestamp,
+            "state": self.materialize_state(checkpoint_id),
+            "reasoning": checkpoint.reasoning,
+            "changes": checkpoint.changes
+        })
 
     def import_checkpoint(self, input_path: str) -> Checkpoint:
         """Imports a checkpoint from a file"""
-        with open(input_path, 'r') as f:
-            data = json.load(f)
+        data = read_json(input_path)
 
         checkpoint = Checkpoint(
             checkpoint_id=data["checkpoint_id"],
@@ -3,13 +3,14 @@ Context Manager Module
 Manages context across interactions with JSON-based persistence
 """
 
-import json
 import os
 from typing import Dict, List, Any, Optional
 from dataclasses import dataclass, field
 from datetime import datetime
 from pathlib import Path
 
+from serialization import read_json, write_json
+
 
 @dataclass
 class UserProfile:
@@ -93,11 +94,10 @@ class ContextManager:
         # Try to load from disk
         profile_path = self.storage_dir / "users" / f"{user_id}.json"
         if profile_path.exists():
-            with open(profile_path, 'r') as f:
-                data = json.load(f)
-                profile = UserProfile(**data)
-                self.user_profiles[user_id] = profile
-                return profile
+            data = read_json(profile_path)
+            profile = UserProfile(**data)
+            self.user_profiles[user_id] = profile
+            return profile
 
         # Create new profile
         profile = UserProfile(
@@ -162,8 +162,7 @@ class ContextManager:
     def _save_user_profile(self, profile: UserProfile):
         """Saves user profile to disk"""
         profile_path = self.storage_dir / "users" / f"{profile.user_id}.json"
-        with open(profile_path, 'w') as f:
-            json.dump(profile.__dict__, f, indent=2)
+        write_json(profile_path, profile.__dict__)
 
     # ─────────────────────────────────────────────────────────────────────
     # Conversation Context Management
@@ -282,16 +281,15 @@ class ContextManager:
     def _save_conversation(self, conversation: ConversationContext):
         """Saves conversation to disk"""
         conv_path = self.storage_dir / "conversations" / f"{conversation.conversation_id}.json"
-        with open(conv_path, 'w') as f:
-            json.dump({
-                "conversation_id": conversation.conversation_id,
-                "user_id": conversation.user_id,
-                "started_at": conversation.started_at,
-                "last_updated": conversation.last_updated,
-                "messages": conversation.messages,
-                "current_prompt": conversation.current_prompt,
-                "metadata": conversation.metadata
-            }, f, indent=2)
+        write_json(conv_path, {
+            "conversation_id": conversation.conversation_id,
+            "user_id": conversation.user_id,
+            "started_at": conversation.started_at,
+            "last_updated": conversation.last_updated,
+            "messages": conversation.messages,
+            "current_prompt": conversation.current_prompt,
+            "metadata": conversation.metadata
+        })
 
     def _load_conversation(self, conversation_id: str) -> Optional[ConversationContext]:
         """Loads conversation from disk"""
@@ -299,9 +297,8 @@ class ContextManager:
         if not conv_path.exists():
             return None
 
-        with open(conv_path, 'r') as f:
-            data = json.load(f)
-            return ConversationContext(**data)
+        data = read_json(conv_path)
+        return ConversationContext(**data)
 
     # ─────────────────────────────────────────────────────────────────────
     # Agent Context Management (for Masumi Network)
@@ -323,11 +320,10 @@ class ContextManager:
         # Try to load from disk
         agent_path = self.storage_dir / "agents" / f"{agent_id}.json"
         if agent_path.exists():
-            with open(agent_path, 'r') as f:
-                data = json.load(f)
-                context = AgentContext(**data)
-                self.agent_contexts[agent_id] = context
-                return context
+            data = read_json(agent_path)
+            context = AgentContext(**data)
+            self.agent_contexts[agent_id] = context
+            return context
 
         # Create new context
         context = AgentContext(
@@ -384,16 +380,15 @@ class ContextManager:
     def _save_agent_context(self, context: AgentContext):
         """Saves agent context to disk"""
         agent_path = self.storage_dir / "agents" / f"{context.agent_id}.json"
-        with open(agent_path, 'w') as f:
-            json.dump({
-                "agent_id": context.agent_id,
-                "relationship_started": context.relationship_started,
-                "last_interaction": context.last_interaction,
-                "total_transactions": context.total_transactions,
-                "service_agreements": context.service_agreements,
-                "conversation_history": context.conversation_history,
-                "payment_history": context.payment_history
-            }, f, indent=2)
+        write_json(agent_path, {
+            "agent_id": context.agent_id,
+            "relationship_started": context.relationship_started,
+            "last_interaction": context.last_interaction,
+            "total_transactions": context.total_transactions,
+            "service_agreements": context.service_agreements,
+            "conversation_history": context.conversation_history,
+            "payment_history": context.payment_history
+        })
 
     # ─────────────────────────────────────────────────────────────────────
     # Utility Methods
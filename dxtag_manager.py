@@ -11,10 +11,11 @@ Includes semantic versioning and dependency management
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
-import json
 import hashlib
 from enum import Enum
 
+from serialization import dumps
+
 
 class VersionType(Enum):
     """Semantic version types"""
@@ -219,7 +220,7 @@ class DxTagManager:
 
         # Output format section
         sections.append("# OUTPUT FORMAT")
-        sections.append(json.dumps(component.execution['output_format'], indent=2))
+        sections.append(dumps(component.execution['output_format'], indent=True))
         sections.append("")
 
         # Examples section
@@ -270,7 +271,7 @@ class DxTagManager:
                 parts.append(f"- {constraint}")
 
         # Output format
-        parts.append(f"\nPlease provide your response in the following format: {json.dumps(component.execution['output_format'])}")
+        parts.append(f"\nPlease provide your response in the following format: {dumps(component.execution['output_format'])}")
 
         return "\n".join(parts)
 
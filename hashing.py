@@ -0,0 +1,51 @@
+"""
+Hashing Module
+Fast non-cryptographic fingerprints for cache keys and content ids
+"""
+
+import hashlib
+from typing import Union
+
+try:
+    import xxhash
+except ImportError:  # pragma: no cover - xxhash is optional
+    xxhash = None
+
+
+def fingerprint(*parts: Union[str, bytes]) -> str:
+    """
+    Computes a 128-bit hex fingerprint of the given parts
+
+    Uses xxh3_128 when xxhash is installed and BLAKE2b otherwise. The
+    active backend is fixed for the life of the process, but fingerprints
+    are not stable across backends, so persist them only as cache keys.
+
+    Args:
+        *parts: Strings (UTF-8 encoded) or bytes, hashed in order as one stream
+
+    Returns:
+        32-character hex digest
+    """
+    h = xxhash.xxh3_128() if xxhash is not None else hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part.encode() if isinstance(part, str) else part)
+    return h.hexdigest()
+
+
+def fingerprint64(*parts: Union[str, bytes]) -> int:
+    """
+    Computes a 64-bit integer fingerprint of the given parts
+
+    Suited to in-memory dict keys, where an int hashes faster than a long
+    string. Same backend rules as fingerprint().
+
+    Args:
+        *parts: Strings (UTF-8 encoded) or bytes, hashed in order as one stream
+
+    Returns:
+        Unsigned 64-bit integer
+    """
+    h = xxhash.xxh3_64() if xxhash is not None else hashlib.blake2b(digest_size=8)
+    for part in parts:
+        h.update(part.encode() if isinstance(part, str) else part)
+    return int.from_bytes(h.digest(), "big")
@@ -10,10 +10,13 @@ import uuid
 from typing import Dict
 from dotenv import load_dotenv
 from fastapi import FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from masumi.config import Config
 from masumi.payment import Payment, Amount
 from prompt_engineering_crew import PromptEngineeringCrew
+from rate_limiter import RateLimitExceeded
+from serialization import dumps
 from logging_config import setup_logging
 
 # Configure logging
@@ -331,6 +334,80 @@ async def health():
     """Health check"""
     return {"status": "healthy"}
 
+def _require_free_access():
+    """Rejects payment-free endpoints when the agent is configured to charge for jobs"""
+    if config and AGENT_IDENTIFIER:
+        raise HTTPException(
+            status_code=402,
+            detail="Payment required: submit the request through /start_job"
+        )
+
+@app.post("/stream")
+async def stream_prd(request: StartJobRequest):
+    """Stream PRD generation as plain text (only when payment is not configured)"""
+    _require_free_access()
+
+    text = request.input_data.get("text", "")
+    style = request.input_data.get("style", "structured")
+
+    crew = PromptEngineeringCrew(logger=logger, verbose=False)
+    chunks = crew.process_input_stream(text=text, style=style)
+
+    # Pull the first chunk eagerly so rejected inputs surface as HTTP errors
+    try:
+        first_chunk = await anext(chunks)
+    except StopAsyncIteration:
+        first_chunk = ""
+    except RateLimitExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def body():
+        yield first_chunk
+        async for chunk in chunks:
+            yield chunk
+
+    return StreamingResponse(body(), media_type="text/plain")
+
+def _sse(event: str, data) -> str:
+    """Formats one server-sent event with a JSON payload"""
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+@app.post("/stream/events")
+async def stream_prd_events(request: StartJobRequest):
+    """Stream PRD generation as server-sent events (only when payment is not configured)
+
+    Emits `stage` events as generation progresses, `delta` events carrying
+    PRD markdown chunks, and a final `done` (or `error`) event. Rejected
+    inputs are reported as an `error` event.
+    """
+    _require_free_access()
+
+    text = request.input_data.get("text", "")
+    style = request.input_data.get("style", "structured")
+
+    async def events():
+        # Sent before generation starts so clients see progress immediately
+        yield _sse("stage", {"stage": "generating"})
+        received = []
+        try:
+            crew = PromptEngineeringCrew(logger=logger, verbose=False)
+            async for chunk in crew.process_input_stream(text=text, style=style):
+                received.append(chunk)
+                yield _sse("delta", chunk)
+        except Exception as e:
+            yield _sse("error", {"error": str(e), "error_type": type(e).__name__})
+            return
+        yield _sse("stage", {"stage": "complete"})
+        yield _sse("done", {"word_count": len("".join(received).split())})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ─────────────────────────────────────────────────────────────────────────────
 # Standalone Mode
 # ─────────────────────────────────────────────────────────────────────────────
@@ -405,6 +482,8 @@ if __name__ == "__main__":
         print(f"  GET  /status?job_id=X  - Check job status")
         print(f"  POST /provide_input    - Provide additional input")
         print(f"  GET  /health           - Health check")
+        print(f"  POST /stream           - Stream PRD generation")
+        print(f"  POST /stream/events    - Stream PRD generation (SSE)")
 
         if config and AGENT_IDENTIFIER:
             print(f"\n💳 Payment Integration:")
@@ -4,17 +4,31 @@ Implements the complete prompt engineering pipeline with specialized agents
 """
 
 import os
+import asyncio
+import atexit
+import functools
+import importlib.util
 import logging
+import random
+import re
+from concurrent.futures import ThreadPoolExecutor
+import httpx
+import litellm
 from crewai import Agent, Crew, Task, LLM
 from logging_config import get_logger
-from thinking_framework import MultiDimensionalThinking
-from dxtag_manager import DxTagManager, PromptComponent
-from refinement_engine import RefinementEngine
 from checkpoint_system import CheckpointSystem
 from context_manager import ContextManager
-from rate_limiter import RateLimiter, RateLimitConfig
-from typing import Dict, Any, Optional, List
-import json
+from hashing import fingerprint
+from response_cache import LLMResponseCache, SemanticPromptCache
+from serialization import dumpb, loads
+from rate_limiter import RateLimiter, RateLimitConfig, RateLimitExceeded, estimate_tokens, extract_retry_info
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from crewai.crews.crew_output import CrewOutput
+    from dxtag_manager import DxTagManager
+    from refinement_engine import RefinementEngine
+    from thinking_framework import MultiDimensionalThinking
 
 # Suppress CrewAI and LiteLLM verbose logging
 logging.getLogger('crewai').setLevel(logging.ERROR)
@@ -22,6 +36,217 @@ logging.getLogger('litellm').setLevel(logging.ERROR)
 logging.getLogger('httpx').setLevel(logging.ERROR)
 logging.getLogger('openai').setLevel(logging.ERROR)
 
+# PRD generator prompt (shared by the direct LLM path and the CrewAI path)
+PRD_ROLE = "Senior Product Manager"
+PRD_GOAL = "Generate complete, professional PRD in one pass"
+# The section list lives in the task prompt only; repeating it here cost tokens on every call
+PRD_BACKSTORY = """You write comprehensive, production-ready PRDs at a top tech company.
+Be concise, specific, and measurable."""
+PRD_SYSTEM_PROMPT = f"You are {PRD_ROLE}. {PRD_BACKSTORY}\nYour personal goal is: {PRD_GOAL}"
+# Static instructions come first and the user input last, so the prompt
+# prefix is byte-identical across requests and eligible for provider-side
+# prompt caching.
+PRD_TASK_PREFIX = """Generate a professional Product Requirements Document (PRD) for the product described at the end of this message.
+
+Create a complete PRD with these 8 sections:
+
+# [Product/Feature Name]
+
+## Product Overview
+2-3 sentences describing what this product/feature is and its core value.
+
+## Problem Statement
+What problem does this solve? What pain points does it address?
+
+## Goals & Objectives
+3-5 specific, measurable goals in bullet points.
+
+## User Stories
+2-3 user stories in format: "As a [user], I want [goal], so that [benefit]"
+
+## Functional Requirements
+Numbered list of specific features and capabilities.
+
+## Non-Functional Requirements
+Performance, security, scalability, usability requirements.
+
+## Success Metrics
+Measurable KPIs to track success (e.g., "90% accuracy", "< 1s response time").
+
+## Out of Scope
+What is explicitly NOT included in this release.
+
+**CRITICAL RULES:**
+- Output ONLY the PRD in markdown format
+- NO meta-commentary or explanations
+- NO phrases like "this demonstrates" or "the final answer"
+- Professional, concise tone
+- Maximum 700 words
+- STOP immediately after "Out of Scope" section
+
+Product/feature to document:
+"""
+# CrewAI fills {text} per kickoff; the direct path appends the input to the prefix
+PRD_TASK_TEMPLATE = PRD_TASK_PREFIX + "{text}"
+# Identifies the static prompt prefix to OpenAI's prompt cache; changes with the prompt
+PRD_PROMPT_CACHE_KEY = "prd-" + fingerprint(PRD_SYSTEM_PROMPT, PRD_TASK_PREFIX)[:16]
+PRD_EXPECTED_OUTPUT = """A complete, professional PRD in markdown format with exactly 8 sections.
+Maximum 700 words. No additional commentary. Just the PRD itself."""
+PRD_TEMPERATURE = 0.2
+
+
+@functools.lru_cache(maxsize=1)
+def _llm_settings() -> Tuple[str, str]:
+    """
+    Reads LLM provider settings from the environment once per process
+
+    Read on first use rather than at import time, because main.py loads
+    .env after importing this module.
+
+    Returns:
+        Tuple of (fully qualified model name, API key)
+
+    Raises:
+        ValueError: If the provider's API key is not configured
+    """
+    provider = os.getenv("LLM_PROVIDER", "openai").lower()
+
+    if provider == "groq":
+        groq_api_key = os.getenv("GROQ_API_KEY")
+        groq_model = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
+
+        if not groq_api_key or groq_api_key == "your_groq_api_key_here":
+            raise ValueError("GROQ_API_KEY not set in .env file")
+
+        return f"groq/{groq_model}", groq_api_key
+    else:  # Default to OpenAI
+        openai_api_key = os.getenv("OPENAI_API_KEY")
+
+        if not openai_api_key or openai_api_key == "your_openai_api_key":
+            raise ValueError("OPENAI_API_KEY not set in .env file")
+
+        return "gpt-4", openai_api_key
+
+
+@functools.lru_cache(maxsize=4)
+def _shared_llm(model: str, api_key: str, max_tokens: int) -> LLM:
+    """
+    Returns a process-wide LLM instance for a provider model
+
+    Args:
+        model: Fully qualified model name (e.g. "groq/llama-3.1-70b-versatile")
+        api_key: Provider API key
+        max_tokens: Hard cap on generated tokens per call
+
+    Returns:
+        Shared LLM instance
+    """
+    return LLM(
+        model=model,
+        api_key=api_key,
+        temperature=PRD_TEMPERATURE,
+        max_tokens=max_tokens
+    )
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_http_client() -> httpx.AsyncClient:
+    """
+    Installs a process-wide pooled HTTP client for litellm's async calls
+
+    Connections to the provider stay alive between requests, so each call
+    skips the TCP and TLS handshake. HTTP/2 is used when the h2 package is
+    installed.
+
+    Returns:
+        Shared httpx.AsyncClient, also set as litellm.aclient_session
+    """
+    client = httpx.AsyncClient(
+        http2=importlib.util.find_spec("h2") is not None,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32, keepalive_expiry=60.0),
+        timeout=httpx.Timeout(120.0, connect=10.0)
+    )
+    litellm.aclient_session = client
+    return client
+
+
+@functools.lru_cache(maxsize=1)
+def _crew_pool() -> ThreadPoolExecutor:
+    """
+    Returns the thread pool that runs blocking CrewAI kickoffs
+
+    Kept separate from the event loop's default executor so long crew runs
+    cannot starve short to_thread work. Sized by CREW_POOL (default 8).
+
+    Returns:
+        Shared ThreadPoolExecutor, shut down at interpreter exit
+    """
+    pool = ThreadPoolExecutor(
+        max_workers=int(os.getenv("CREW_POOL", "8")),
+        thread_name_prefix="crew"
+    )
+    atexit.register(pool.shutdown, wait=False)
+    return pool
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_response_cache() -> LLMResponseCache:
+    """
+    Returns the process-wide PRD response cache
+
+    Shared across crew instances because main.py builds a crew per request.
+
+    Returns:
+        Shared LLMResponseCache, flushed to disk at interpreter exit
+    """
+    cache = LLMResponseCache()
+    atexit.register(cache.flush)
+    return cache
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_semantic_cache() -> Optional[SemanticPromptCache]:
+    """
+    Returns the process-wide semantic cache when enabled
+
+    Opt-in via SEMANTIC_CACHE=true because it needs sentence-transformers.
+
+    Returns:
+        Shared SemanticPromptCache, or None when disabled
+    """
+    if os.getenv("SEMANTIC_CACHE", "false").lower() != "true":
+        return None
+
+    cache = SemanticPromptCache(
+        threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+    )
+    atexit.register(cache.flush)
+    return cache
+
+
+@functools.lru_cache(maxsize=1)
+def _shared_rate_limiter() -> RateLimiter:
+    """
+    Returns the process-wide rate limiter
+
+    Shared across crew instances because main.py builds a crew per request;
+    a per-instance limiter would start empty and never throttle. The limits
+    cover all server traffic, paid /start_job jobs included, so they default
+    to production-sized values and are read from the environment on first use
+    (RATE_LIMIT_PER_SECOND, RATE_LIMIT_PER_MINUTE, RATE_LIMIT_PER_HOUR,
+    RATE_LIMIT_PER_DAY, RATE_LIMIT_TOKENS_PER_MINUTE).
+
+    Returns:
+        Shared RateLimiter
+    """
+    return RateLimiter(RateLimitConfig(
+        requests_per_second=int(os.getenv("RATE_LIMIT_PER_SECOND", "20")),
+        requests_per_minute=int(os.getenv("RATE_LIMIT_PER_MINUTE", "600")),
+        requests_per_hour=int(os.getenv("RATE_LIMIT_PER_HOUR", "20000")),
+        requests_per_day=int(os.getenv("RATE_LIMIT_PER_DAY", "200000")),
+        tokens_per_minute=int(os.getenv("RATE_LIMIT_TOKENS_PER_MINUTE", "1000000"))
+    ))
+
 
 class PromptEngineeringCrew:
     """
@@ -32,8 +257,34 @@ class PromptEngineeringCrew:
     MIN_INPUT_LENGTH = 10
     MAX_INPUT_LENGTH = 5000
     SUPPORTED_STYLES = ["structured", "minimal", "conversational"]
+    SUSPICIOUS_PATTERN = re.compile(r"<script|javascript:|eval\(|exec\(", re.IGNORECASE)
+    MAX_OUTPUT_TOKENS = 1000  # 700-word PRD at ~1.33 tokens/word plus headroom
+
+    # Retry configuration for transient provider errors
+    MAX_KICKOFF_ATTEMPTS = 5
+    MAX_RETRY_DELAY = 30.0  # seconds
+    CREW_MIN_INPUT_TOKENS = 200  # shorter inputs skip CrewAI even when enabled
+    RETRYABLE_ERRORS = {
+        "RateLimitError", "APIConnectionError", "InternalServerError",
+        "ServiceUnavailableError", "Timeout", "TimeoutError", "ConnectionError"
+    }
+
+    # Agents and tasks are input-independent; one template per model
+    _crew_templates: Dict[str, Crew] = {}
+
+    # Stateless subsystems shared by every instance
+    _shared: Dict[str, Any] = {}
+
+    # Generations in flight, keyed on response cache key
+    _inflight: Dict[str, "asyncio.Task[Tuple[str, Dict[str, Any], bool]]"] = {}
 
-    def __init__(self, verbose=True, logger=None, user_id: Optional[str] = None):
+    def __init__(
+        self,
+        verbose=True,
+        logger=None,
+        user_id: Optional[str] = None,
+        use_crewai: bool = False
+    ):
         """
         Initialize production-grade prompt engineering crew
 
@@ -41,10 +292,13 @@ class PromptEngineeringCrew:
             verbose: Whether to enable verbose logging
             logger: Optional logger instance
             user_id: Optional user identifier for context management
+            use_crewai: Route generation through CrewAI instead of a direct LLM call
+                (short and minimal-style inputs still use the direct call)
         """
         self.verbose = verbose
         self.logger = logger or get_logger(__name__)
         self.user_id = user_id
+        self.use_crewai = use_crewai
 
         # Configure LLM based on provider
         try:
@@ -53,16 +307,15 @@ class PromptEngineeringCrew:
             self.logger.error(f"LLM configuration failed: {e}")
             raise
 
-        # Initialize core systems
-        self.thinking_framework = MultiDimensionalThinking()
-        self.dxtag_manager = DxTagManager()
-        self.refinement_engine = RefinementEngine()
+        _shared_http_client()
+
+        # Initialize core systems (analysis subsystems are built on first use)
         self.checkpoint_system = CheckpointSystem()
         self.context_manager = ContextManager()
-        self.rate_limiter = RateLimiter(RateLimitConfig())
+        self.rate_limiter = _shared_rate_limiter()
+        self.response_cache = _shared_response_cache()
+        self.semantic_cache = _shared_semantic_cache()
 
-        # Create crew
-        self.crew = self.create_crew()
         self.logger.info("Production PromptEngineeringCrew initialized successfully")
 
     def _validate_input(self, text: str, style: str) -> tuple[bool, Optional[str]]:
@@ -88,11 +341,8 @@ class PromptEngineeringCrew:
             return False, f"Invalid style '{style}'. Supported: {', '.join(self.SUPPORTED_STYLES)}"
 
         # Check for malicious content (basic)
-        suspicious_patterns = ['<script', 'javascript:', 'eval(', 'exec(']
-        text_lower = text.lower()
-        for pattern in suspicious_patterns:
-            if pattern in text_lower:
-                return False, "Input contains potentially malicious content."
+        if self.SUSPICIOUS_PATTERN.search(text):
+            return False, "Input contains potentially malicious content."
 
         return True, None
 
@@ -103,31 +353,38 @@ class PromptEngineeringCrew:
         Returns:
             Configured LLM instance
         """
-        provider = os.getenv("LLM_PROVIDER", "openai").lower()
+        model, api_key = _llm_settings()
+        self.logger.info(f"Using LLM with model: {model}")
+        return _shared_llm(model, api_key, self.MAX_OUTPUT_TOKENS)
 
-        if provider == "groq":
-            groq_api_key = os.getenv("GROQ_API_KEY")
-            groq_model = os.getenv("GROQ_MODEL", "llama-3.1-70b-versatile")
+    @property
+    def thinking_framework(self) -> "MultiDimensionalThinking":
+        """Stateless thinking framework shared by all instances, built on demand"""
+        framework = self._shared.get("thinking_framework")
+        if framework is None:
+            from thinking_framework import MultiDimensionalThinking
+            framework = self._shared.setdefault("thinking_framework", MultiDimensionalThinking())
+        return framework
 
-            if not groq_api_key or groq_api_key == "your_groq_api_key_here":
-                raise ValueError("GROQ_API_KEY not set in .env file")
+    @functools.cached_property
+    def dxtag_manager(self) -> "DxTagManager":
+        """DxTag manager, unused by the PRD path and built on demand"""
+        from dxtag_manager import DxTagManager
+        return DxTagManager()
 
-            self.logger.info(f"Using Groq LLM with model: {groq_model}")
-            return LLM(
-                model=f"groq/{groq_model}",
-                api_key=groq_api_key
-            )
-        else:  # Default to OpenAI
-            openai_api_key = os.getenv("OPENAI_API_KEY")
+    @functools.cached_property
+    def refinement_engine(self) -> "RefinementEngine":
+        """Refinement engine, unused by the PRD path and built on demand"""
+        from refinement_engine import RefinementEngine
+        return RefinementEngine()
 
-            if not openai_api_key or openai_api_key == "your_openai_api_key":
-                raise ValueError("OPENAI_API_KEY not set in .env file")
-
-            self.logger.info("Using OpenAI LLM with model: gpt-4")
-            return LLM(
-                model="gpt-4",
-                api_key=openai_api_key
-            )
+    @property
+    def crew(self) -> Crew:
+        """Crew template shared by all instances using the same model, built on first use"""
+        template = self._crew_templates.get(self.llm.model)
+        if template is None:
+            template = self._crew_templates[self.llm.model] = self.create_crew()
+        return template
 
     def create_crew(self) -> Crew:
         """
@@ -140,12 +397,9 @@ class PromptEngineeringCrew:
 
         # Single PRD Generator Agent (simplified)
         prd_generator = Agent(
-            role='Senior Product Manager',
-            goal='Generate complete, professional PRD in one pass',
-            backstory='''You are a senior PM at a top tech company. You create comprehensive,
-            production-ready PRDs with 8 sections: Product Overview, Problem Statement,
-            Goals & Objectives, User Stories, Functional Requirements, Non-Functional Requirements,
-            Success Metrics, and Out of Scope. Be concise, specific, and measurable.''',
+            role=PRD_ROLE,
+            goal=PRD_GOAL,
+            backstory=PRD_BACKSTORY,
             verbose=False,
             llm=self.llm,
             max_iter=1,
@@ -155,45 +409,8 @@ class PromptEngineeringCrew:
         # Single streamlined task for clean output
         tasks = [
             Task(
-                description='''Generate a professional Product Requirements Document (PRD) for: {text}
-
-                Create a complete PRD with these 8 sections:
-
-                # [Product/Feature Name]
-
-                ## Product Overview
-                2-3 sentences describing what this product/feature is and its core value.
-
-                ## Problem Statement
-                What problem does this solve? What pain points does it address?
-
-                ## Goals & Objectives
-                3-5 specific, measurable goals in bullet points.
-
-                ## User Stories
-                2-3 user stories in format: "As a [user], I want [goal], so that [benefit]"
-
-                ## Functional Requirements
-                Numbered list of specific features and capabilities.
-
-                ## Non-Functional Requirements
-                Performance, security, scalability, usability requirements.
-
-                ## Success Metrics
-                Measurable KPIs to track success (e.g., "90% accuracy", "< 1s response time").
-
-                ## Out of Scope
-                What is explicitly NOT included in this release.
-
-                **CRITICAL RULES:**
-                - Output ONLY the PRD in markdown format
-                - NO meta-commentary or explanations
-                - NO phrases like "this demonstrates" or "the final answer"
-                - Professional, concise tone
-                - Maximum 700 words
-                - STOP immediately after "Out of Scope" section''',
-                expected_output='''A complete, professional PRD in markdown format with exactly 8 sections.
-                Maximum 700 words. No additional commentary. Just the PRD itself.''',
+                description=PRD_TASK_TEMPLATE,
+                expected_output=PRD_EXPECTED_OUTPUT,
                 agent=prd_generator
             )
         ]
@@ -212,7 +429,9 @@ class PromptEngineeringCrew:
         self,
         text: str,
         style: str = "structured",
-        conversation_id: Optional[str] = None
+        conversation_id: Optional[str] = None,
+        checkpoint: bool = False,
+        wait: bool = False
     ) -> Dict[str, Any]:
         """
         Production-grade input processing with validation and error handling
@@ -221,6 +440,8 @@ class PromptEngineeringCrew:
             text: Raw input text (10-5000 chars)
             style: Output style (structured, minimal, conversational)
             conversation_id: Optional conversation ID for context
+            checkpoint: Whether to record rollback checkpoints for this request
+            wait: Whether to wait for rate limit capacity instead of rejecting
 
         Returns:
             Dictionary with PRD output and metadata
@@ -228,6 +449,365 @@ class PromptEngineeringCrew:
         Raises:
             ValueError: If input validation fails
         """
+        # Validate input and check rate limits
+        rejection, reservation, input_tokens = await self._admit_request(text, style, wait)
+        if rejection:
+            return rejection
+        cost_units = input_tokens + self.MAX_OUTPUT_TOKENS
+
+        use_crew = self._routes_to_crew(input_tokens, style)
+
+        # Cache lookups come before any other per-request work
+        cache_key, partition = self._cache_keys(text, style, use_crew)
+        cached, cache_source = await self._lookup_cache(text, cache_key, partition)
+
+        # Checkpoints are opt-in (most traffic never rolls back) and are
+        # written together once the request finishes
+        pending_checkpoints: List[Dict[str, Any]] = []
+        if checkpoint:
+            pending_checkpoints.append({
+                "state": {"text": text, "style": style},
+                "reasoning": "Starting prompt engineering process",
+                "changes": ["Initial input received"]
+            })
+
+        # Context and checkpoint persistence hit the disk (and git); it runs in
+        # worker threads alongside generation and is awaited once at the end
+        persistence = [asyncio.create_task(
+            asyncio.to_thread(self._record_user_message, text, style, conversation_id)
+        )]
+
+        try:
+            if cached is not None:
+                # Same (or near-identical) input already generated; no tokens are spent
+                prd_output = cached["prd"]
+                word_count = cached["word_count"]
+                usage = self._token_usage(0, 0, 0)
+                truncated = False
+                self.rate_limiter.settle(reservation, 0, self.user_id)
+                self.logger.info(f"✅ PRD served from {cache_source} cache ({word_count} words)")
+            else:
+                # Run streamlined PRD generation (single pass)
+                self.logger.info("Generating PRD...")
+                prd_output, usage, truncated, coalesced = await self._generate_coalesced(
+                    cache_key, text, use_crew
+                )
+
+                # Word count is kept as an observability metric; length is capped by max_tokens
+                word_count = len(prd_output.split())
+                if truncated:
+                    self.logger.warning(f"PRD cut off at the {self.MAX_OUTPUT_TOKENS}-token limit; not caching it")
+
+                if coalesced:
+                    # An identical request was already in flight; its result (and cost) is shared
+                    cache_source = "coalesced"
+                    usage = self._token_usage(0, 0, 0)
+                    self.rate_limiter.settle(reservation, 0, self.user_id)
+                else:
+                    # Settle the reservation at its actual cost when the provider reports it
+                    self.rate_limiter.settle(reservation, usage["total_tokens"] or cost_units, self.user_id)
+                    if not truncated:
+                        entry = {"prd": prd_output, "word_count": word_count}
+                        self.response_cache.set(cache_key, entry)
+                        if self.semantic_cache is not None:
+                            persistence.append(asyncio.create_task(
+                                asyncio.to_thread(self.semantic_cache.add, text, entry, partition)
+                            ))
+
+                self.logger.info(f"✅ PRD generated ({word_count} words)")
+
+            # Record only what changed since the initial checkpoint
+            if checkpoint:
+                pending_checkpoints.append({
+                    "state": {"prd": prd_output, "word_count": word_count},
+                    "reasoning": "PRD generated",
+                    "changes": ["PRD output added"],
+                    "delta": True
+                })
+                persistence.append(asyncio.create_task(
+                    asyncio.to_thread(self.checkpoint_system.create_checkpoints_batch, pending_checkpoints)
+                ))
+
+            conversation_id = await self._finish_persistence(persistence, conversation_id)
+
+            return {
+                "success": True,
+                "prd": prd_output,
+                "metadata": {
+                    "word_count": word_count,
+                    "style": style,
+                    "input_length": len(text),
+                    "cache": cache_source,
+                    "truncated": truncated,
+                    "usage": usage
+                },
+                "conversation_id": conversation_id
+            }
+
+        except Exception as e:
+            self.logger.error(f"Production pipeline error: {str(e)}", exc_info=True)
+            self.rate_limiter.record_failure(self.user_id)
+
+            # Preserve inputs lost to transient errors for later replay
+            retry_recommended = self._is_retryable(e)
+
+            def persist_failure(error: Exception):
+                # Queued checkpoints first so the dead letter chains after them
+                if pending_checkpoints:
+                    self.checkpoint_system.create_checkpoints_batch(pending_checkpoints)
+                if retry_recommended:
+                    self.checkpoint_system.create_checkpoint(
+                        state={"text": text, "style": style, "error": str(error)},
+                        reasoning="Dead letter: retries exhausted for transient error",
+                        changes=[f"Failed after {self.MAX_KICKOFF_ATTEMPTS} attempts: {type(error).__name__}"],
+                        auto_commit=False
+                    )
+
+            persistence.append(asyncio.create_task(asyncio.to_thread(persist_failure, e)))
+            await self._finish_persistence(persistence, conversation_id)
+
+            # Return structured error
+            error_type = type(e).__name__
+            return {
+                "success": False,
+                "error": str(e),
+                "error_type": error_type,
+                "rate_limit_info": {**self.rate_limiter.get_stats(), **extract_retry_info(e)},
+                "retry_recommended": retry_recommended
+            }
+
+    async def _finish_persistence(
+        self,
+        tasks: List["asyncio.Task[Any]"],
+        conversation_id: Optional[str]
+    ) -> Optional[str]:
+        """
+        Awaits a request's background persistence, logging rather than raising failures
+
+        Args:
+            tasks: Persistence tasks; the first records the user message
+            conversation_id: Conversation ID passed in by the caller
+
+        Returns:
+            Conversation ID used, falling back to the caller's if recording failed
+        """
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                self.logger.warning(f"Background persistence failed: {result}")
+
+        recorded = results[0]
+        return conversation_id if isinstance(recorded, BaseException) else recorded
+
+    async def process_input_stream(
+        self,
+        text: str,
+        style: str = "structured",
+        conversation_id: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Streams the PRD as it is generated instead of waiting for completion
+
+        Validation and rate limiting run up front; rejected inputs raise
+        before the first chunk is yielded. Cached PRDs are yielded whole,
+        and a freshly generated PRD is cached once its last chunk is out
+        unless it was cut off at the output token limit.
+
+        Args:
+            text: Raw input text (10-5000 chars)
+            style: Output style (structured, minimal, conversational)
+            conversation_id: Optional conversation ID for context
+
+        Yields:
+            PRD markdown chunks
+
+        Raises:
+            RateLimitExceeded: If rate limiting rejects the request
+            ValueError: If input validation rejects the request
+        """
+        rejection, reservation, input_tokens = await self._admit_request(text, style)
+        if rejection:
+            if rejection["error_type"] == "rate_limit_error":
+                raise RateLimitExceeded(rejection["error"])
+            raise ValueError(rejection["error"])
+        cost_units = input_tokens + self.MAX_OUTPUT_TOKENS
+
+        use_crew = self._routes_to_crew(input_tokens, style)
+        cache_key, partition = self._cache_keys(text, style, use_crew)
+        cached, cache_source = await self._lookup_cache(text, cache_key, partition)
+
+        await asyncio.to_thread(self._record_user_message, text, style, conversation_id)
+
+        if cached is not None:
+            self.rate_limiter.settle(reservation, 0, self.user_id)
+            self.logger.info(f"✅ PRD served from {cache_source} cache ({cached['word_count']} words)")
+            yield cached["prd"]
+            return
+
+        chunks = []
+        usage = self._token_usage(0, 0, 0)
+        truncated = False
+        try:
+            if use_crew:
+                # CrewAI does not expose token streaming; emit the result whole
+                prd_output, usage, truncated = await self._generate_with_retry(text, use_crew=True)
+                chunks.append(prd_output)
+                yield prd_output
+            else:
+                response = await litellm.acompletion(
+                    **self._completion_kwargs(text),
+                    stream=True,
+                    stream_options={"include_usage": True}
+                )
+                async for chunk in response:
+                    # The provider reports usage on a final chunk with no choices
+                    if getattr(chunk, "usage", None):
+                        usage = self._completion_usage(chunk.usage)
+                    if not chunk.choices:
+                        continue
+                    if chunk.choices[0].finish_reason == "length":
+                        truncated = True
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        chunks.append(delta)
+                        yield delta
+        except Exception as e:
+            self.logger.error(f"Streaming pipeline error: {str(e)}", exc_info=True)
+            self.rate_limiter.record_failure(self.user_id)
+            raise
+
+        # Settle at the actual cost when the provider reports it
+        self.rate_limiter.settle(reservation, usage["total_tokens"] or cost_units, self.user_id)
+
+        prd_output = "".join(chunks)
+        word_count = len(prd_output.split())
+        if truncated:
+            self.logger.warning(f"PRD cut off at the {self.MAX_OUTPUT_TOKENS}-token limit; not caching it")
+        else:
+            entry = {"prd": prd_output, "word_count": word_count}
+            self.response_cache.set(cache_key, entry)
+            if self.semantic_cache is not None:
+                try:
+                    await asyncio.to_thread(self.semantic_cache.add, text, entry, partition)
+                except Exception as e:
+                    self.logger.warning(f"Semantic cache update failed: {e}")
+
+        self.logger.info(f"✅ PRD streamed ({word_count} words)")
+
+    async def _lookup_cache(
+        self,
+        text: str,
+        cache_key: str,
+        partition: str
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+        """
+        Looks up a previously generated PRD, exact match first, then semantic
+
+        Args:
+            text: Validated input text
+            cache_key: Exact-match cache key for the request
+            partition: Semantic cache partition for the request
+
+        Returns:
+            Tuple of (cached entry or None, "exact"/"semantic"/None)
+        """
+        cached = self.response_cache.get(cache_key)
+        if cached is not None:
+            return cached, "exact"
+
+        if self.semantic_cache is None:
+            return None, None
+
+        try:
+            # Embedding is CPU-bound; keep it off the event loop
+            cached = await asyncio.to_thread(self.semantic_cache.lookup, text, partition)
+        except Exception as e:
+            # A broken semantic cache must not fail the request
+            self.logger.warning(f"Semantic cache lookup failed: {e}")
+            return None, None
+
+        if cached is None:
+            return None, None
+
+        # Promote so the next identical request is an exact hit
+        self.response_cache.set(cache_key, {
+            "prd": cached["prd"],
+            "word_count": cached["word_count"]
+        })
+        return cached, "semantic"
+
+    def _cache_keys(self, text: str, style: str, use_crew: bool) -> Tuple[str, str]:
+        """
+        Builds the cache identifiers for a request
+
+        Args:
+            text: Validated input text
+            style: Output style
+            use_crew: Whether the request generates through CrewAI
+
+        Returns:
+            Tuple of (exact-match cache key, semantic cache partition)
+        """
+        cache_key = self.response_cache.make_key(
+            text_hash=fingerprint(text),
+            style=style,
+            model=self.llm.model,
+            use_crewai=use_crew,
+            prompt=PRD_PROMPT_CACHE_KEY,
+            max_tokens=self.MAX_OUTPUT_TOKENS,
+            temperature=self.llm.temperature
+        )
+        return cache_key, self._semantic_partition(style, use_crew)
+
+    def _semantic_partition(self, style: str, use_crew: bool) -> str:
+        """Semantic cache partition: paraphrases only match within the same style, model, path and prompt settings"""
+        path = "crewai" if use_crew else "direct"
+        return (
+            f"{style}|{self.llm.model}|{path}|{PRD_PROMPT_CACHE_KEY}"
+            f"|{self.MAX_OUTPUT_TOKENS}|{self.llm.temperature}"
+        )
+
+    def _routes_to_crew(self, input_tokens: int, style: str) -> bool:
+        """
+        Decides whether a request goes through CrewAI when it is enabled
+
+        Short and minimal-style inputs gain nothing from the agent loop, so
+        they take the single direct LLM call even with CrewAI enabled.
+
+        Args:
+            input_tokens: Estimated token count of the input
+            style: Output style
+
+        Returns:
+            True to generate through CrewAI, False for a direct call
+        """
+        return (
+            self.use_crewai
+            and style != "minimal"
+            and input_tokens >= self.CREW_MIN_INPUT_TOKENS
+        )
+
+    async def _admit_request(
+        self,
+        text: str,
+        style: str,
+        wait: bool = False
+    ) -> Tuple[Optional[Dict[str, Any]], Optional[float], int]:
+        """
+        Validates input and reserves rate limit capacity before any generation work
+
+        Tokens are only counted once the input has passed validation, so
+        rejected payloads are never tokenized.
+
+        Args:
+            text: Raw input text
+            style: Output style
+            wait: Whether to wait for capacity instead of rejecting
+
+        Returns:
+            Tuple of (error response if rejected, rate limit reservation if
+            admitted, estimated input tokens)
+        """
         # Input validation (production safety)
         is_valid, error_msg = self._validate_input(text, style)
         if not is_valid:
@@ -236,35 +816,45 @@ class PromptEngineeringCrew:
                 "success": False,
                 "error": error_msg,
                 "error_type": "validation_error"
-            }
+            }, None, 0
 
         self.logger.info(f"Processing validated input ({len(text)} chars, style={style})")
 
-        # Check rate limit
-        allowed, reason = self.rate_limiter.check_rate_limit(self.user_id)
-        if not allowed:
+        # Reserve a slot at the estimated token cost; settled once the request finishes
+        input_tokens = estimate_tokens(text, self.llm.model)
+        cost_units = input_tokens + self.MAX_OUTPUT_TOKENS
+        if wait:
+            reservation, reason = await self.rate_limiter.acquire(self.user_id, cost=cost_units)
+        else:
+            reservation, reason = self.rate_limiter.reserve(self.user_id, cost=cost_units)
+        if reservation is None:
             self.logger.warning(f"Rate limit exceeded: {reason}")
             return {
                 "success": False,
                 "error": reason,
                 "error_type": "rate_limit_error",
                 "rate_limit_info": self.rate_limiter.get_stats()
-            }
+            }, None, input_tokens
 
-        # Create checkpoint at start
-        initial_state = {
-            "text": text,
-            "style": style,
-            "timestamp": self.checkpoint_system.checkpoints.get(
-                self.checkpoint_system.current_checkpoint
-            ).timestamp if self.checkpoint_system.current_checkpoint else None
-        }
-        self.checkpoint_system.create_checkpoint(
-            state=initial_state,
-            reasoning="Starting prompt engineering process",
-            changes=["Initial input received"]
-        )
+        return None, reservation, input_tokens
 
+    def _record_user_message(
+        self,
+        text: str,
+        style: str,
+        conversation_id: Optional[str]
+    ) -> Optional[str]:
+        """
+        Creates the conversation if needed and records the user's input
+
+        Args:
+            text: Raw input text
+            style: Output style
+            conversation_id: Optional existing conversation ID
+
+        Returns:
+            Conversation ID used (None when no conversation is tracked)
+        """
         # Create or get conversation context
         if not conversation_id and self.user_id:
             conversation_id = self.context_manager.create_conversation(
@@ -280,46 +870,378 @@ class PromptEngineeringCrew:
                 content=text
             )
 
-        try:
-            # Run streamlined PRD generation (single pass)
-            self.logger.info("Generating PRD...")
-            crew_result = self.crew.kickoff(inputs={"text": text})
+        return conversation_id
 
-            # Extract PRD output
-            prd_output = crew_result.raw if hasattr(crew_result, "raw") else str(crew_result)
+    def _completion_kwargs(self, text: str) -> Dict[str, Any]:
+        """
+        Builds the litellm arguments for a direct PRD generation call
 
-            # Validate output
-            word_count = len(prd_output.split())
+        Args:
+            text: Validated input text
 
-            # Record successful request
-            self.rate_limiter.record_request(self.user_id)
+        Returns:
+            Keyword arguments for litellm.acompletion
+        """
+        kwargs = {
+            "model": self.llm.model,
+            "api_key": self.llm.api_key,
+            "messages": self._build_messages(text),
+            "temperature": self.llm.temperature,
+            "max_tokens": self.llm.max_tokens
+        }
+        if not self.llm.model.startswith("groq/"):
+            # Route requests sharing the static prefix to the same OpenAI cache shard
+            kwargs["extra_body"] = {"prompt_cache_key": PRD_PROMPT_CACHE_KEY}
+        return kwargs
 
-            self.logger.info(f"✅ PRD generated ({word_count} words)")
+    @staticmethod
+    def _build_messages(text: str) -> List[Dict[str, str]]:
+        """Builds the chat messages for a direct PRD generation call"""
+        return [
+            {"role": "system", "content": PRD_SYSTEM_PROMPT},
+            {"role": "user", "content": PRD_TASK_PREFIX + text}
+        ]
 
-            return {
-                "success": True,
-                "prd": prd_output,
-                "metadata": {
-                    "word_count": word_count,
-                    "style": style,
-                    "input_length": len(text)
-                },
-                "conversation_id": conversation_id
-            }
+    async def _generate(self, text: str, use_crew: bool) -> Tuple[str, Dict[str, Any], bool]:
+        """
+        Generates the PRD with a single LLM call, or through CrewAI
 
-        except Exception as e:
-            self.logger.error(f"Production pipeline error: {str(e)}", exc_info=True)
-            self.rate_limiter.record_failure(self.user_id)
+        Args:
+            text: Validated input text
+            use_crew: Whether to generate through CrewAI
 
-            # Return structured error
-            error_type = type(e).__name__
-            return {
+        Returns:
+            Tuple of (raw PRD markdown, token usage, whether the output was
+            cut off at the max_tokens limit)
+        """
+        if use_crew:
+            # A Crew holds per-kickoff state, so each run uses its own copy
+            crew_result: CrewOutput = await asyncio.get_running_loop().run_in_executor(
+                _crew_pool(),
+                functools.partial(self.crew.copy().kickoff, inputs={"text": text})
+            )
+            metrics = crew_result.token_usage
+            # CrewAI does not expose the final call's finish reason
+            return crew_result.raw, self._token_usage(
+                getattr(metrics, "prompt_tokens", 0),
+                getattr(metrics, "completion_tokens", 0),
+                getattr(metrics, "cached_prompt_tokens", 0)
+            ), False
+
+        response = await litellm.acompletion(**self._completion_kwargs(text))
+        choice = response.choices[0]
+        return (
+            choice.message.content or "",
+            self._completion_usage(response.usage),
+            choice.finish_reason == "length"
+        )
+
+    def _completion_usage(self, usage: Any) -> Dict[str, Any]:
+        """Normalizes the usage block of a litellm completion response"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        return self._token_usage(
+            getattr(usage, "prompt_tokens", 0),
+            getattr(usage, "completion_tokens", 0),
+            getattr(details, "cached_tokens", 0)
+        )
+
+    @staticmethod
+    def _token_usage(prompt_tokens: int, completion_tokens: int, cached_tokens: int) -> Dict[str, Any]:
+        """
+        Normalizes provider token counts into the usage reported to callers
+
+        Args:
+            prompt_tokens: Input tokens billed for the request
+            completion_tokens: Generated tokens
+            cached_tokens: Input tokens served from the provider's prompt cache
+
+        Returns:
+            Usage dict with totals and the prompt cache hit rate
+        """
+        prompt_tokens = prompt_tokens or 0
+        completion_tokens = completion_tokens or 0
+        cached_tokens = cached_tokens or 0
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "cached_tokens": cached_tokens,
+            "cache_hit_rate": cached_tokens / max(1, prompt_tokens)
+        }
+
+    async def _generate_coalesced(
+        self,
+        cache_key: str,
+        text: str,
+        use_crew: bool
+    ) -> Tuple[str, Dict[str, Any], bool, bool]:
+        """
+        Runs generation once for concurrent identical requests
+
+        The first request for a cache key generates; requests with the same
+        key arriving before it finishes await its result instead of calling
+        the LLM again.
+
+        Args:
+            cache_key: Exact-match cache key identifying the request
+            text: Validated input text
+            use_crew: Whether to generate through CrewAI
+
+        Returns:
+            Tuple of (raw PRD markdown, token usage, whether the output was
+            truncated, whether the result was shared)
+        """
+        inflight = self._inflight.get(cache_key)
+        if inflight is not None:
+            prd_output, usage, truncated = await asyncio.shield(inflight)
+            return prd_output, usage, truncated, True
+
+        # Generation runs as its own task so cancelling the request that
+        # started it does not cancel it for the requests sharing its result
+        task = asyncio.ensure_future(self._generate_with_retry(text, use_crew))
+        self._inflight[cache_key] = task
+
+        def finished(done: "asyncio.Task[Tuple[str, Dict[str, Any], bool]]"):
+            if self._inflight.get(cache_key) is done:
+                del self._inflight[cache_key]
+            # Mark retrieved so a failure nobody awaited is not logged as unhandled
+            if not done.cancelled():
+                done.exception()
+
+        task.add_done_callback(finished)
+        prd_output, usage, truncated = await asyncio.shield(task)
+        return prd_output, usage, truncated, False
+
+    async def _generate_with_retry(self, text: str, use_crew: bool) -> Tuple[str, Dict[str, Any], bool]:
+        """
+        Runs generation with exponential backoff and full jitter on transient errors
+
+        Args:
+            text: Validated input text
+            use_crew: Whether to generate through CrewAI
+
+        Returns:
+            Tuple of (raw PRD markdown, token usage, whether the output was truncated)
+        """
+        attempt = 0
+        while True:
+            try:
+                return await self._generate(text, use_crew)
+            except Exception as e:
+                attempt += 1
+                if not self._is_retryable(e) or attempt >= self.MAX_KICKOFF_ATTEMPTS:
+                    raise
+
+                delay = self._retry_delay(attempt, e)
+                self.logger.warning(
+                    f"Transient error ({type(e).__name__}), retrying in {delay:.1f}s "
+                    f"(attempt {attempt}/{self.MAX_KICKOFF_ATTEMPTS})"
+                )
+                await asyncio.sleep(delay)
+
+    def _is_retryable(self, error: Exception) -> bool:
+        """Checks whether an error is a transient provider error worth retrying"""
+        # Client errors (auth, bad request, context window) are permanent,
+        # except request timeouts and rate limits
+        status = getattr(error, "status_code", None)
+        if isinstance(status, int):
+            if status in (408, 429) or status >= 500:
+                return True
+            if 400 <= status < 500:
+                return False
+        return any(cls.__name__ in self.RETRYABLE_ERRORS for cls in type(error).__mro__)
+
+    def _retry_delay(self, attempt: int, error: Exception) -> float:
+        """
+        Computes the delay before the next retry attempt
+
+        Args:
+            attempt: Number of attempts made so far
+            error: Error raised by the last attempt
+
+        Returns:
+            Delay in seconds (provider retry-after hint takes precedence)
+        """
+        retry_after = extract_retry_info(error).get("retry_after")
+        if retry_after is not None:
+            try:
+                return min(float(retry_after), self.MAX_RETRY_DELAY)
+            except ValueError:
+                pass
+
+        config = self.rate_limiter.config
+        ceiling = min(
+            config.initial_backoff * (config.backoff_multiplier ** (attempt - 1)),
+            self.MAX_RETRY_DELAY
+        )
+        return random.uniform(0, ceiling)
+
+    async def process_batch(
+        self,
+        inputs: List[Dict[str, str]],
+        concurrency: int = 16
+    ) -> List[Dict[str, Any]]:
+        """
+        Processes many inputs concurrently for bulk PRD generation
+
+        Inputs are dispatched longest-first (by estimated token count) so
+        the largest generations start early instead of trailing the batch.
+        Each input waits for rate limit capacity rather than being rejected.
+
+        Args:
+            inputs: List of input dicts with "text" and optional "style"
+            concurrency: Maximum number of inputs processed at once
+
+        Returns:
+            List of results in the same order as inputs
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run_one(item: Dict[str, str]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.process_input(
+                    text=item.get("text", ""),
+                    style=item.get("style", "structured"),
+                    wait=True
+                )
+
+        def dispatch_size(i: int) -> int:
+            # Inputs validation will reject are not tokenized; they fail fast at the back
+            text = inputs[i].get("text", "")
+            if not isinstance(text, str) or len(text) > self.MAX_INPUT_LENGTH:
+                return 0
+            return estimate_tokens(text, self.llm.model)
+
+        order = sorted(range(len(inputs)), key=dispatch_size, reverse=True)
+
+        self.logger.info(f"Processing batch of {len(inputs)} inputs (concurrency={concurrency})")
+        dispatched = await asyncio.gather(
+            *(run_one(inputs[i]) for i in order),
+            return_exceptions=True
+        )
+
+        results: List[Dict[str, Any]] = [None] * len(inputs)
+        for i, result in zip(order, dispatched):
+            results[i] = result if not isinstance(result, BaseException) else {
                 "success": False,
-                "error": str(e),
-                "error_type": error_type,
-                "rate_limit_info": self.rate_limiter.get_stats(),
-                "retry_recommended": error_type in ["TimeoutError", "ConnectionError"]
+                "error": str(result),
+                "error_type": type(result).__name__
             }
+        return results
+
+    async def submit_batch(self, inputs: List[Dict[str, str]]) -> Dict[str, Any]:
+        """
+        Submits inputs to the OpenAI Batch API for discounted offline generation
+
+        Results arrive within 24 hours and are collected with poll_batch.
+        Invalid inputs are rejected up front; nothing is submitted if any fail.
+
+        Args:
+            inputs: List of input dicts with "text" and optional "style"
+
+        Returns:
+            Dictionary with the batch ID and number of submitted requests
+
+        Raises:
+            ValueError: If an input is invalid or the provider has no batch support
+        """
+        if self.llm.model.startswith("groq/"):
+            raise ValueError("Batch generation requires LLM_PROVIDER=openai")
+
+        for index, item in enumerate(inputs):
+            is_valid, error_msg = self._validate_input(item.get("text", ""), item.get("style", "structured"))
+            if not is_valid:
+                raise ValueError(f"Input {index}: {error_msg}")
+
+        requests = b"\n".join(
+            dumpb({
+                "custom_id": str(index),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": self.llm.model,
+                    "messages": self._build_messages(item["text"]),
+                    "temperature": self.llm.temperature,
+                    "max_tokens": self.llm.max_tokens,
+                    "prompt_cache_key": PRD_PROMPT_CACHE_KEY
+                }
+            })
+            for index, item in enumerate(inputs)
+        )
+
+        batch_file = await litellm.acreate_file(
+            file=("prd_batch.jsonl", requests),
+            purpose="batch",
+            custom_llm_provider="openai",
+            api_key=self.llm.api_key
+        )
+        batch = await litellm.acreate_batch(
+            completion_window="24h",
+            endpoint="/v1/chat/completions",
+            input_file_id=batch_file.id,
+            custom_llm_provider="openai",
+            api_key=self.llm.api_key
+        )
+
+        self.logger.info(f"Submitted batch {batch.id} with {len(inputs)} inputs")
+        return {"batch_id": batch.id, "num_requests": len(inputs)}
+
+    async def poll_batch(self, batch_id: str) -> Dict[str, Any]:
+        """
+        Checks a submitted batch and collects its PRDs once complete
+
+        Args:
+            batch_id: ID returned by submit_batch
+
+        Returns:
+            Dictionary with the batch status and, once completed, results in
+            submission order (same shape as process_batch entries)
+        """
+        batch = await litellm.aretrieve_batch(
+            batch_id=batch_id,
+            custom_llm_provider="openai",
+            api_key=self.llm.api_key
+        )
+        if batch.status != "completed":
+            return {"batch_id": batch_id, "status": batch.status, "results": None}
+
+        results: List[Dict[str, Any]] = [
+            {"success": False, "error": "No result returned", "error_type": "batch_error"}
+            for _ in range(batch.request_counts.total)
+        ]
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await litellm.afile_content(
+                file_id=file_id,
+                custom_llm_provider="openai",
+                api_key=self.llm.api_key
+            )
+            for line in content.content.splitlines():
+                if not line.strip():
+                    continue
+                row = loads(line)
+                response = row.get("response") or {}
+                if response.get("status_code") == 200:
+                    choice = response["body"]["choices"][0]
+                    prd_output = choice["message"]["content"] or ""
+                    results[int(row["custom_id"])] = {
+                        "success": True,
+                        "prd": prd_output,
+                        "metadata": {
+                            "word_count": len(prd_output.split()),
+                            "truncated": choice.get("finish_reason") == "length"
+                        }
+                    }
+                else:
+                    error = row.get("error") or response.get("body", {}).get("error") or {}
+                    results[int(row["custom_id"])] = {
+                        "success": False,
+                        "error": error.get("message", "Batch request failed"),
+                        "error_type": "batch_error"
+                    }
+
+        return {"batch_id": batch_id, "status": batch.status, "results": results}
 
     def get_conversation_context(self, conversation_id: str) -> List[Dict[str, Any]]:
         """Gets conversation history"""
@@ -331,9 +1253,13 @@ class PromptEngineeringCrew:
 
     def get_statistics(self) -> Dict[str, Any]:
         """Gets comprehensive statistics"""
+        # Report refinement stats only if the engine was ever used; don't build it for this
+        refinement_engine = self.__dict__.get("refinement_engine")
         return {
             "context": self.context_manager.get_statistics(),
             "rate_limiter": self.rate_limiter.get_stats(),
-            "refinement": self.refinement_engine.get_refinement_stats(),
+            "response_cache": self.response_cache.get_stats(),
+            "semantic_cache": self.semantic_cache.get_stats() if self.semantic_cache else None,
+            "refinement": refinement_engine.get_refinement_stats() if refinement_engine else None,
             "checkpoints": len(self.checkpoint_system.checkpoints)
         }
@@ -4,21 +4,32 @@ Implements intelligent rate limiting with exponential backoff to prevent API cos
 """
 
 import time
+import math
 import asyncio
-from typing import Dict, Optional, Callable, Any
-from dataclasses import dataclass, field
-from datetime import datetime, timedelta
-from collections import deque
+import bisect
+import functools
+from typing import Dict, Optional, Callable, Any, Hashable
+from dataclasses import dataclass
+from collections import OrderedDict, deque
 import random
+import weakref
 
+from hashing import fingerprint, fingerprint64
+from serialization import dumpb
 
-@dataclass
+
+class RateLimitExceeded(ValueError):
+    """Raised when the rate limiter rejects a request"""
+
+
+@dataclass(slots=True)
 class RateLimitConfig:
     """Configuration for rate limiting"""
     requests_per_second: int = 2
     requests_per_minute: int = 10
     requests_per_hour: int = 100
     requests_per_day: int = 1000
+    tokens_per_minute: int = 20000
 
     # Backoff configuration
     initial_backoff: float = 1.0  # seconds
@@ -27,12 +38,96 @@ class RateLimitConfig:
     jitter: bool = True
 
 
-@dataclass
-class RequestRecord:
-    """Record of a single request"""
-    timestamp: datetime
-    user_id: Optional[str] = None
-    endpoint: Optional[str] = None
+TOKEN_COUNT_CACHE_SIZE = 4096
+
+# (model, text fingerprint) -> token count, least recently used first
+_token_counts: "OrderedDict[tuple[str, str], int]" = OrderedDict()
+
+
+@functools.lru_cache(maxsize=8)
+def _get_encoder(model: str = "gpt-4"):
+    """
+    Loads the tiktoken encoder for a model once per process
+
+    Provider prefixes ("openai/gpt-4o") are stripped; models tiktoken does
+    not know, such as Groq-hosted Llama, fall back to cl100k_base.
+
+    Returns:
+        Encoding, or None if tiktoken is not installed or its vocabulary
+        cannot be loaded (the None is cached, so a failed download is not
+        retried on every request)
+    """
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+
+    try:
+        try:
+            return tiktoken.encoding_for_model(model.rsplit("/", 1)[-1])
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str, model: str = "gpt-4") -> int:
+    """
+    Estimates the token count of a piece of text
+
+    Counts are cached per model and text fingerprint, so repeated inputs
+    skip re-encoding.
+
+    Args:
+        text: Text to estimate
+        model: Model whose tokenizer to count with
+
+    Returns:
+        Token count from the cached tiktoken encoder, or ~4 characters
+        per token when tiktoken is not installed
+    """
+    encoder = _get_encoder(model)
+    if encoder is None:
+        return len(text) // 4
+
+    key = (model, fingerprint(text))
+    count = _token_counts.get(key)
+    if count is not None:
+        _token_counts.move_to_end(key)
+        return count
+
+    count = len(encoder.encode(text, disallowed_special=()))
+    _token_counts[key] = count
+    if len(_token_counts) > TOKEN_COUNT_CACHE_SIZE:
+        _token_counts.popitem(last=False)
+    return count
+
+
+def extract_retry_info(error: Exception) -> Dict[str, Any]:
+    """
+    Extracts provider retry hints from a rate limit error
+
+    Reads the `retry-after` and `x-ratelimit-reset-*` response headers
+    exposed by OpenAI-compatible providers when present.
+
+    Args:
+        error: Exception raised by the LLM client
+
+    Returns:
+        Dictionary of retry hints (empty if none are available)
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return {}
+
+    retry_info = {}
+    for header in ("retry-after", "x-ratelimit-reset-requests", "x-ratelimit-reset-tokens"):
+        value = headers.get(header)
+        if value is not None:
+            retry_info[header.replace("-", "_")] = value
+
+    return retry_info
 
 
 class RateLimiter:
@@ -48,73 +143,177 @@ class RateLimiter:
             config: Rate limit configuration (uses conservative defaults if not provided)
         """
         self.config = config or RateLimitConfig()
-        self.requests: deque = deque()
-        self.backoff_until: Dict[str, float] = {}  # user_id -> timestamp
+
+        # Every request in the last day, as parallel columns kept in lockstep
+        self._timestamps: deque = deque()  # time.monotonic() seconds
+        self._user_ids: deque = deque()
+        self._endpoints: deque = deque()
+        self._tokens: deque = deque()
+
+        # Timestamps inside the shorter windows, so each check is a len()
+        # instead of a scan over the whole day
+        self._second: deque = deque()
+        self._minute: deque = deque()
+        self._minute_costs: deque = deque()  # tokens, parallel to _minute
+        self._hour: deque = deque()
+        self._minute_tokens = 0
+        self.backoff_until: Dict[str, float] = {}  # user_id -> monotonic deadline
         self.consecutive_failures: Dict[str, int] = {}  # user_id -> count
 
-    def check_rate_limit(self, user_id: Optional[str] = None) -> tuple[bool, Optional[str]]:
+        # Private generator for backoff jitter, independent of the global one
+        self._rng = random.Random()
+
+        # Set by reset() so waiters re-check before their computed deadline.
+        # An Event binds to the first loop that waits on it, and the limiter
+        # is shared process-wide, so each running loop gets its own
+        self._state_changed: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Event]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def check_rate_limit(
+        self,
+        user_id: Optional[str] = None,
+        cost: int = 0
+    ) -> tuple[bool, Optional[str]]:
         """
         Checks if a request should be allowed
 
         Args:
             user_id: Optional user identifier for per-user limits
+            cost: Estimated token cost of the request
 
         Returns:
             Tuple of (allowed: bool, reason: Optional[str])
         """
-        now = datetime.now()
-        self._cleanup_old_requests(now)
+        now = time.monotonic()
+        self._advance(now)
 
         # Check backoff period
         if user_id and user_id in self.backoff_until:
-            if time.time() < self.backoff_until[user_id]:
-                wait_time = self.backoff_until[user_id] - time.time()
+            if now < self.backoff_until[user_id]:
+                wait_time = self.backoff_until[user_id] - now
                 return False, f"Rate limit exceeded. Please wait {wait_time:.1f} seconds."
 
         # Check per-second limit
-        one_second_ago = now - timedelta(seconds=1)
-        recent_requests = sum(1 for r in self.requests if r.timestamp > one_second_ago)
-        if recent_requests >= self.config.requests_per_second:
+        if len(self._second) >= self.config.requests_per_second:
             return False, "Per-second rate limit exceeded"
 
         # Check per-minute limit
-        one_minute_ago = now - timedelta(minutes=1)
-        minute_requests = sum(1 for r in self.requests if r.timestamp > one_minute_ago)
-        if minute_requests >= self.config.requests_per_minute:
+        if len(self._minute) >= self.config.requests_per_minute:
             return False, "Per-minute rate limit exceeded"
 
+        # Check per-minute token limit
+        if self._minute_tokens + cost > self.config.tokens_per_minute:
+            return False, "Per-minute token limit exceeded"
+
         # Check per-hour limit
-        one_hour_ago = now - timedelta(hours=1)
-        hour_requests = sum(1 for r in self.requests if r.timestamp > one_hour_ago)
-        if hour_requests >= self.config.requests_per_hour:
+        if len(self._hour) >= self.config.requests_per_hour:
             return False, "Per-hour rate limit exceeded"
 
         # Check per-day limit
-        one_day_ago = now - timedelta(days=1)
-        day_requests = sum(1 for r in self.requests if r.timestamp > one_day_ago)
-        if day_requests >= self.config.requests_per_day:
+        if len(self._timestamps) >= self.config.requests_per_day:
             return False, "Per-day rate limit exceeded"
 
         return True, None
 
-    def record_request(self, user_id: Optional[str] = None, endpoint: Optional[str] = None):
+    def record_request(
+        self,
+        user_id: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        tokens: int = 0
+    ):
         """
         Records a successful request
 
         Args:
             user_id: Optional user identifier
             endpoint: Optional endpoint identifier
+            tokens: Tokens consumed by the request
         """
-        self.requests.append(RequestRecord(
-            timestamp=datetime.now(),
-            user_id=user_id,
-            endpoint=endpoint
-        ))
+        self._append(user_id, endpoint, tokens)
 
         # Reset consecutive failures on success
         if user_id and user_id in self.consecutive_failures:
             self.consecutive_failures[user_id] = 0
 
+    def reserve(
+        self,
+        user_id: Optional[str] = None,
+        cost: int = 0
+    ) -> tuple[Optional[float], Optional[str]]:
+        """
+        Checks the limits and, if allowed, records the request in the same step
+
+        The slot and estimated cost are held from admission, so concurrent
+        requests cannot all pass the check before any of them is recorded.
+
+        Args:
+            user_id: Optional user identifier for per-user limits
+            cost: Estimated token cost of the request
+
+        Returns:
+            Tuple of (reservation handle or None, rejection reason or None)
+        """
+        allowed, reason = self.check_rate_limit(user_id, cost)
+        if not allowed:
+            return None, reason
+        return self._append(user_id, None, cost), None
+
+    async def acquire(
+        self,
+        user_id: Optional[str] = None,
+        cost: int = 0,
+        max_wait: float = 300.0
+    ) -> tuple[Optional[float], Optional[str]]:
+        """
+        Waits until the request fits the limits, then reserves it
+
+        Args:
+            user_id: Optional user identifier for per-user limits
+            cost: Estimated token cost of the request
+            max_wait: Maximum seconds to wait for capacity
+
+        Returns:
+            Tuple of (reservation handle or None, rejection reason or None)
+        """
+        if cost > self.config.tokens_per_minute:
+            return None, "Request exceeds the per-minute token limit"
+
+        deadline = time.monotonic() + max_wait
+        while True:
+            reservation, reason = self.reserve(user_id, cost)
+            if reservation is not None:
+                return reservation, None
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None, reason
+
+            await self._wait_for_change(min(self.time_until_allowed(user_id, cost), remaining))
+
+    def settle(self, reservation: float, tokens: int, user_id: Optional[str] = None):
+        """
+        Records a reserved request as successful at the tokens it actually used
+
+        Args:
+            reservation: Handle returned by reserve() or acquire()
+            tokens: Tokens consumed by the request
+            user_id: Optional user identifier
+        """
+        self._advance(time.monotonic())
+
+        i = bisect.bisect_left(self._minute, reservation)
+        if i < len(self._minute) and self._minute[i] == reservation:
+            self._minute_tokens += tokens - self._minute_costs[i]
+            self._minute_costs[i] = tokens
+
+        i = bisect.bisect_left(self._timestamps, reservation)
+        if i < len(self._timestamps) and self._timestamps[i] == reservation:
+            self._tokens[i] = tokens
+
+        if user_id and user_id in self.consecutive_failures:
+            self.consecutive_failures[user_id] = 0
+
     def record_failure(self, user_id: Optional[str] = None):
         """
         Records a failed request and applies backoff
@@ -137,10 +336,10 @@ class RateLimiter:
 
         # Add jitter to prevent thundering herd
         if self.config.jitter:
-            backoff = backoff * (0.5 + random.random() * 0.5)
+            backoff = backoff * (0.5 + self._rng.random() * 0.5)
 
         # Set backoff expiration
-        self.backoff_until[user_id] = time.time() + backoff
+        self.backoff_until[user_id] = time.monotonic() + backoff
 
     async def wait_if_needed(self, user_id: Optional[str] = None) -> bool:
         """
@@ -153,7 +352,7 @@ class RateLimiter:
             True if request can proceed, False if permanently blocked
         """
         max_wait_time = 300  # 5 minutes max wait
-        start_time = time.time()
+        start_time = time.monotonic()
 
         while True:
             allowed, reason = self.check_rate_limit(user_id)
@@ -162,15 +361,62 @@ class RateLimiter:
                 return True
 
             # Check if we've been waiting too long
-            if time.time() - start_time > max_wait_time:
+            elapsed = time.monotonic() - start_time
+            if elapsed > max_wait_time:
                 return False
 
-            # Wait before retry
-            wait_time = 1.0  # Base wait time
-            if user_id and user_id in self.backoff_until:
-                wait_time = max(wait_time, self.backoff_until[user_id] - time.time())
+            await self._wait_for_change(min(self.time_until_allowed(user_id), max_wait_time - elapsed))
+
+    async def _wait_for_change(self, wait_time: float):
+        """Sleeps until the blocking window frees a slot, or until reset()"""
+        loop = asyncio.get_running_loop()
+        state_changed = self._state_changed.get(loop)
+        if state_changed is None:
+            state_changed = self._state_changed[loop] = asyncio.Event()
+
+        state_changed.clear()
+        try:
+            await asyncio.wait_for(state_changed.wait(), timeout=max(wait_time, 0.01))
+        except asyncio.TimeoutError:
+            pass
+
+    def time_until_allowed(self, user_id: Optional[str] = None, cost: int = 0) -> float:
+        """
+        Computes how long until check_rate_limit would allow a request
+
+        Args:
+            user_id: Optional user identifier
+            cost: Estimated token cost of the request
+
+        Returns:
+            Seconds to wait (0.0 if a request is allowed now)
+        """
+        now = time.monotonic()
+        self._advance(now)
+        waits = [0.0]
 
-            await asyncio.sleep(min(wait_time, 5.0))
+        if user_id and user_id in self.backoff_until:
+            waits.append(self.backoff_until[user_id] - now)
+
+        # A full window frees a slot when its oldest surplus entry expires
+        for window, limit, span in (
+            (self._second, self.config.requests_per_second, 1.0),
+            (self._minute, self.config.requests_per_minute, 60.0),
+            (self._hour, self.config.requests_per_hour, 3600.0),
+            (self._timestamps, self.config.requests_per_day, 86400.0)
+        ):
+            if len(window) >= limit:
+                waits.append(window[len(window) - limit] + span - now)
+
+        if self._minute and self._minute_tokens + cost > self.config.tokens_per_minute:
+            freed = 0
+            for timestamp, tokens in zip(self._minute, self._minute_costs):
+                freed += tokens
+                if self._minute_tokens - freed + cost <= self.config.tokens_per_minute:
+                    break
+            waits.append(timestamp + 60.0 - now)
+
+        return max(waits)
 
     def get_stats(self) -> Dict[str, Any]:
         """
@@ -179,22 +425,20 @@ class RateLimiter:
         Returns:
             Dictionary with statistics
         """
-        now = datetime.now()
-        self._cleanup_old_requests(now)
-
-        one_minute_ago = now - timedelta(minutes=1)
-        one_hour_ago = now - timedelta(hours=1)
-        one_day_ago = now - timedelta(days=1)
+        now = time.monotonic()
+        self._advance(now)
 
         return {
-            "total_requests": len(self.requests),
-            "requests_last_minute": sum(1 for r in self.requests if r.timestamp > one_minute_ago),
-            "requests_last_hour": sum(1 for r in self.requests if r.timestamp > one_hour_ago),
-            "requests_last_day": sum(1 for r in self.requests if r.timestamp > one_day_ago),
+            "total_requests": len(self._timestamps),
+            "requests_last_minute": len(self._minute),
+            "requests_last_hour": len(self._hour),
+            "requests_last_day": len(self._timestamps),
+            "tokens_last_minute": self._minute_tokens,
             "limit_per_minute": self.config.requests_per_minute,
+            "limit_tokens_per_minute": self.config.tokens_per_minute,
             "limit_per_hour": self.config.requests_per_hour,
             "limit_per_day": self.config.requests_per_day,
-            "active_backoffs": len([k for k, v in self.backoff_until.items() if v > time.time()])
+            "active_backoffs": sum(1 for v in self.backoff_until.values() if v > now)
         }
 
     def reset(self, user_id: Optional[str] = None):
@@ -205,21 +449,89 @@ class RateLimiter:
             user_id: If provided, only resets for this user
         """
         if user_id:
-            self.requests = deque([r for r in self.requests if r.user_id != user_id])
+            keep = [i for i, uid in enumerate(self._user_ids) if uid != user_id]
+            for column in ("_timestamps", "_user_ids", "_endpoints", "_tokens"):
+                values = getattr(self, column)
+                setattr(self, column, deque([values[i] for i in keep]))
+            self._rebuild_windows()
             if user_id in self.backoff_until:
                 del self.backoff_until[user_id]
             if user_id in self.consecutive_failures:
                 del self.consecutive_failures[user_id]
         else:
-            self.requests.clear()
+            for column in (self._timestamps, self._user_ids, self._endpoints, self._tokens):
+                column.clear()
+            self._rebuild_windows()
             self.backoff_until.clear()
             self.consecutive_failures.clear()
 
-    def _cleanup_old_requests(self, now: datetime):
-        """Removes requests older than 1 day"""
-        one_day_ago = now - timedelta(days=1)
-        while self.requests and self.requests[0].timestamp < one_day_ago:
-            self.requests.popleft()
+        for state_changed in list(self._state_changed.values()):
+            state_changed.set()
+
+    def _advance(self, now: float):
+        """Drops requests that have aged out of each window"""
+        one_second_ago = now - 1.0
+        while self._second and self._second[0] <= one_second_ago:
+            self._second.popleft()
+
+        one_minute_ago = now - 60.0
+        while self._minute and self._minute[0] <= one_minute_ago:
+            self._minute.popleft()
+            self._minute_tokens -= self._minute_costs.popleft()
+
+        one_hour_ago = now - 3600.0
+        while self._hour and self._hour[0] <= one_hour_ago:
+            self._hour.popleft()
+
+        one_day_ago = now - 86400.0
+        while self._timestamps and self._timestamps[0] <= one_day_ago:
+            self._timestamps.popleft()
+            self._user_ids.popleft()
+            self._endpoints.popleft()
+            self._tokens.popleft()
+
+    def _append(self, user_id: Optional[str], endpoint: Optional[str], tokens: int) -> float:
+        """
+        Adds a request to the day log and the short windows
+
+        Returns:
+            The request's timestamp, unique within the log
+        """
+        now = time.monotonic()
+        self._advance(now)
+        if self._timestamps and now <= self._timestamps[-1]:
+            # Keep timestamps strictly increasing so they can identify a request
+            now = math.nextafter(self._timestamps[-1], math.inf)
+
+        self._timestamps.append(now)
+        self._user_ids.append(user_id)
+        self._endpoints.append(endpoint)
+        self._tokens.append(tokens)
+        self._second.append(now)
+        self._minute.append(now)
+        self._minute_costs.append(tokens)
+        self._hour.append(now)
+        self._minute_tokens += tokens
+        return now
+
+    def _rebuild_windows(self):
+        """Refills the short windows from the day log after it was edited"""
+        self._second.clear()
+        self._minute.clear()
+        self._minute_costs.clear()
+        self._hour.clear()
+        self._minute_tokens = 0
+
+        now = time.monotonic()
+        for timestamp, tokens in zip(self._timestamps, self._tokens):
+            if timestamp > now - 3600.0:
+                self._hour.append(timestamp)
+            if timestamp > now - 60.0:
+                self._minute.append(timestamp)
+                self._minute_costs.append(tokens)
+                self._minute_tokens += tokens
+            if timestamp > now - 1.0:
+                self._second.append(timestamp)
 
 
 class CachedRateLimiter(RateLimiter):
@@ -227,33 +539,65 @@ class CachedRateLimiter(RateLimiter):
     Rate limiter with caching support to minimize redundant requests
     """
 
-    def __init__(self, config: Optional[RateLimitConfig] = None, cache_ttl: int = 900):
+    SWEEP_INTERVAL = 64  # cache operations between full expiry sweeps
+
+    def __init__(
+        self,
+        config: Optional[RateLimitConfig] = None,
+        cache_ttl: int = 900,
+        maxsize: int = 1024
+    ):
         """
         Initialize cached rate limiter
 
         Args:
             config: Rate limit configuration
             cache_ttl: Cache time-to-live in seconds (default 15 minutes)
+            maxsize: Maximum number of cached entries (least recently used evicted)
         """
         super().__init__(config)
-        self.cache: Dict[str, tuple[Any, float]] = {}  # key -> (result, expiry)
+        # key -> (result, expiry), ordered least to most recently used
+        self.cache: "OrderedDict[Hashable, tuple[Any, float]]" = OrderedDict()
         self.cache_ttl = cache_ttl
+        self.maxsize = maxsize
         self.cache_hits = 0
         self.cache_misses = 0
+        self._ops_since_sweep = 0
+
+    @staticmethod
+    def make_key(payload: Any) -> int:
+        """
+        Builds a compact cache key from a request payload
+
+        For prompt-response caching, pass make_key({"prompt": p, "model": m})
+        rather than a raw string key: the payload is canonicalized (sorted
+        keys) and reduced to a 64-bit int, so lookups cost the same for any
+        prompt length.
 
-    def get_cached(self, key: str) -> Optional[Any]:
+        Args:
+            payload: JSON-serializable request parameters
+
+        Returns:
+            64-bit integer key
+        """
+        return fingerprint64(dumpb(payload, sort_keys=True))
+
+    def get_cached(self, key: Hashable) -> Optional[Any]:
         """
         Gets a cached result if available and not expired
 
         Args:
-            key: Cache key
+            key: Cache key (a string, or an int from make_key)
 
         Returns:
             Cached result or None if not found/expired
         """
+        self._maybe_sweep()
+
         if key in self.cache:
             result, expiry = self.cache[key]
-            if time.time() < expiry:
+            if time.monotonic() < expiry:
+                self.cache.move_to_end(key)
                 self.cache_hits += 1
                 return result
             else:
@@ -263,16 +607,22 @@ class CachedRateLimiter(RateLimiter):
         self.cache_misses += 1
         return None
 
-    def set_cached(self, key: str, value: Any):
+    def set_cached(self, key: Hashable, value: Any):
         """
         Stores a result in cache
 
         Args:
-            key: Cache key
+            key: Cache key (a string, or an int from make_key)
             value: Value to cache
         """
-        expiry = time.time() + self.cache_ttl
+        self._maybe_sweep()
+
+        expiry = time.monotonic() + self.cache_ttl
         self.cache[key] = (value, expiry)
+        self.cache.move_to_end(key)
+
+        while len(self.cache) > self.maxsize:
+            self.cache.popitem(last=False)
 
     def clear_cache(self):
         """Clears all cached entries"""
@@ -287,9 +637,22 @@ class CachedRateLimiter(RateLimiter):
             "cache_hits": self.cache_hits,
             "cache_misses": self.cache_misses,
             "hit_rate": hit_rate,
-            "cached_entries": len(self.cache)
+            "cached_entries": len(self.cache),
+            "maxsize": self.maxsize
         }
 
+    def _maybe_sweep(self):
+        """Drops every expired entry once per SWEEP_INTERVAL cache operations"""
+        self._ops_since_sweep += 1
+        if self._ops_since_sweep < self.SWEEP_INTERVAL:
+            return
+
+        self._ops_since_sweep = 0
+        now = time.monotonic()
+        expired = [key for key, (_, expiry) in self.cache.items() if expiry <= now]
+        for key in expired:
+            del self.cache[key]
+
 
 async def rate_limited(func: Callable, rate_limiter: RateLimiter, user_id: Optional[str] = None):
     """
@@ -3,10 +3,13 @@ Refinement Engine Module
 Implements the two-iteration internal refinement process for quality assurance
 """
 
+import functools
+import re
+from collections import ChainMap, Counter
 from typing import Dict, List, Any, Optional, Tuple
 from dataclasses import dataclass, field
 from datetime import datetime
-from dxtag_manager import PromptComponent, VersionType
+from dxtag_manager import PromptComponent
 
 
 @dataclass
@@ -18,6 +21,7 @@ class RefinementCriteria:
     no_ambiguities: bool = False
     proper_structure: bool = False
     score: float = 0.0
+    flags: int = 0  # criteria met, one bit each in the field order above
 
 
 @dataclass
@@ -28,9 +32,143 @@ class RefinementIteration:
     refined_prompt: PromptComponent
     criteria: RefinementCriteria
     improvements: List[str]
+    refinement_id: int = 0  # shared by the iterations of one refine() call
+    original_score: float = 0.0
+    refined_score: float = 0.0
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
 
 
+# Definitive replacements for ambiguous task wording
+AMBIGUOUS_REPLACEMENTS = {
+    "maybe": "specifically",
+    "possibly": "definitely",
+    "might": "will",
+    "could": "should",
+    "perhaps": "certainly",
+    "somehow": "by using"
+}
+AMBIGUOUS_WORDS = tuple(AMBIGUOUS_REPLACEMENTS)
+_AMBIGUOUS_SET = frozenset(AMBIGUOUS_WORDS)
+_TOKEN_RE = re.compile(r"[a-z']+")
+_AMBIGUOUS_RE = re.compile(r"\b(" + "|".join(AMBIGUOUS_WORDS) + r")\b")
+
+
+@functools.lru_cache(maxsize=1024)
+def _score_criteria(
+    has_role: bool,
+    task: str,
+    constraint_count: int,
+    has_output_format: bool,
+    has_context: bool
+) -> Tuple[bool, bool, bool, bool, bool, float, int]:
+    """
+    Scores the quality criteria from the prompt fields they depend on
+
+    Cached on those fields, so re-evaluating an unchanged prompt (history
+    stats, repeated refinement of similar prompts) skips the text checks.
+
+    Returns:
+        Tuple of (clear_intent, specific_constraints, easy_parsing,
+        no_ambiguities, proper_structure, score, flags)
+    """
+    clear_intent = bool(has_role and task and len(task.split()) > 5)
+
+    # Check for specific constraints
+    specific_constraints = constraint_count >= 2
+
+    # Check for easy parsing (well-defined output format)
+    easy_parsing = has_output_format
+
+    # Check for ambiguities (heuristic), by whole word like the replacement
+    no_ambiguities = _AMBIGUOUS_SET.isdisjoint(_TOKEN_RE.findall(task.lower()))
+
+    # Check for proper structure
+    parts = has_role | bool(task) << 1 | has_context << 2 | has_output_format << 3
+    proper_structure = parts.bit_count() >= 3
+
+    # Calculate overall score from the criteria packed one bit each
+    flags = (
+        clear_intent
+        | specific_constraints << 1
+        | easy_parsing << 2
+        | no_ambiguities << 3
+        | proper_structure << 4
+    )
+    return (
+        clear_intent,
+        specific_constraints,
+        easy_parsing,
+        no_ambiguities,
+        proper_structure,
+        flags.bit_count() / 5,
+        flags
+    )
+
+
+def _clarify_intent(data: ChainMap, execution: ChainMap):
+    """Expands a brief role and task"""
+    # Enhance role if too brief
+    if len(data.get("role", "")) < 20:
+        current_role = data.get("role", "professional assistant")
+        data["role"] = f"an expert {current_role} specializing in prompt engineering"
+
+    # Enhance task if too brief
+    if len(data.get("task", "")) < 30:
+        current_task = data.get("task", "")
+        data["task"] = f"{current_task}. Ensure the output is clear, accurate, and comprehensive."
+
+
+def _add_constraints(data: ChainMap, execution: ChainMap):
+    """Adds default constraints when fewer than two are set"""
+    current_constraints = execution.get("constraints", [])
+    if len(current_constraints) < 2:
+        default_constraints = [
+            "Ensure output is well-formatted and easy to read",
+            "Provide complete and accurate information",
+            "Maintain professional tone throughout"
+        ]
+        execution["constraints"] = current_constraints + default_constraints
+
+
+def _define_output_format(data: ChainMap, execution: ChainMap):
+    """Adds a structured output format when none is set"""
+    if not execution.get("output_format"):
+        execution["output_format"] = {
+            "type": "structured",
+            "format": "text",
+            "sections": ["main_content", "summary"]
+        }
+
+
+def _remove_ambiguities(data: ChainMap, execution: ChainMap):
+    """Replaces ambiguous words with definitive language in one pass"""
+    task = data.get("task", "")
+    definite_task = _AMBIGUOUS_RE.sub(lambda m: AMBIGUOUS_REPLACEMENTS[m.group(1)], task)
+    if definite_task != task:
+        data["task"] = definite_task
+
+
+def _improve_structure(data: ChainMap, execution: ChainMap):
+    """Ensures all key components exist"""
+    if not data.get("context"):
+        data["context"] = {
+            "purpose": "general prompt engineering",
+            "target": "AI language model"
+        }
+
+
+# (tag, description, handler) per criterion, in RefinementCriteria.flags bit order
+IMPROVEMENTS = (
+    ("clarify_intent", "Enhance role definition and task description for clarity", _clarify_intent),
+    ("add_constraints", "Add specific constraints and requirements", _add_constraints),
+    ("define_output_format", "Define clear output format specification", _define_output_format),
+    ("remove_ambiguities", "Remove ambiguous language and add specificity", _remove_ambiguities),
+    ("improve_structure", "Enhance overall prompt structure", _improve_structure)
+)
+ALL_CRITERIA = (1 << len(IMPROVEMENTS)) - 1
+_IMPROVEMENT_HANDLERS = {tag: handler for tag, _, handler in IMPROVEMENTS}
+
+
 class RefinementEngine:
     """
     Manages the two-iteration internal refinement process
@@ -38,7 +176,8 @@ class RefinementEngine:
 
     def __init__(self):
         self.refinement_history: List[RefinementIteration] = []
-        self.improvement_patterns: Dict[str, int] = {}  # Track common improvements
+        self.improvement_patterns: Counter = Counter()  # Track common improvements
+        self._next_refinement_id = 0
 
     def refine(
         self,
@@ -46,7 +185,10 @@ class RefinementEngine:
         context: Optional[Dict[str, Any]] = None
     ) -> Tuple[PromptComponent, List[RefinementIteration]]:
         """
-        Performs two-iteration refinement on a prompt
+        Performs up to two refinement iterations on a prompt
+
+        The second iteration is skipped when the first leaves the prompt
+        unchanged, since it would evaluate the same prompt to the same result.
 
         Args:
             initial_prompt: The initial prompt to refine
@@ -56,24 +198,30 @@ class RefinementEngine:
             Tuple of (final_prompt, iteration_history)
         """
         iterations = []
-        current_prompt = initial_prompt
+        timestamp = datetime.now().isoformat()
+        refinement_id = self._next_refinement_id
+        self._next_refinement_id += 1
 
         # First iteration
-        first_refined, first_iteration = self._perform_iteration(
-            current_prompt,
+        current_prompt, first_iteration = self._perform_iteration(
+            initial_prompt,
             iteration_number=1,
-            context=context
+            context=context,
+            refinement_id=refinement_id,
+            timestamp=timestamp
         )
         iterations.append(first_iteration)
-        current_prompt = first_refined
 
         # Second iteration
-        second_refined, second_iteration = self._perform_iteration(
-            current_prompt,
-            iteration_number=2,
-            context=context
-        )
-        iterations.append(second_iteration)
+        if current_prompt is not initial_prompt:
+            current_prompt, second_iteration = self._perform_iteration(
+                current_prompt,
+                iteration_number=2,
+                context=context,
+                refinement_id=refinement_id,
+                timestamp=timestamp
+            )
+            iterations.append(second_iteration)
 
         # Update refinement history
         self.refinement_history.extend(iterations)
@@ -81,13 +229,15 @@ class RefinementEngine:
         # Learn from improvements
         self._update_improvement_patterns(iterations)
 
-        return second_refined, iterations
+        return current_prompt, iterations
 
     def _perform_iteration(
         self,
         prompt: PromptComponent,
         iteration_number: int,
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        refinement_id: int = 0,
+        timestamp: Optional[str] = None
     ) -> Tuple[PromptComponent, RefinementIteration]:
         """
         Performs a single refinement iteration
@@ -96,6 +246,8 @@ class RefinementEngine:
             prompt: Current prompt
             iteration_number: Which iteration (1 or 2)
             context: Optional context
+            refinement_id: Id of the refine() call this iteration belongs to
+            timestamp: ISO timestamp for the record (defaults to now)
 
         Returns:
             Tuple of (refined_prompt, iteration_record)
@@ -113,13 +265,22 @@ class RefinementEngine:
             # Already good enough, minimal changes
             refined_prompt = prompt
 
+        if refined_prompt is prompt:
+            refined_score = criteria.score
+        else:
+            refined_score = self._evaluate_prompt(refined_prompt).score
+
         # Create iteration record
         iteration = RefinementIteration(
             iteration_number=iteration_number,
             original_prompt=prompt,
             refined_prompt=refined_prompt,
             criteria=criteria,
-            improvements=improvements
+            improvements=improvements,
+            refinement_id=refinement_id,
+            original_score=criteria.score,
+            refined_score=refined_score,
+            timestamp=timestamp or datetime.now().isoformat()
         )
 
         return refined_prompt, iteration
@@ -134,46 +295,13 @@ class RefinementEngine:
         Returns:
             RefinementCriteria with evaluation results
         """
-        criteria = RefinementCriteria()
-
-        # Check for clear intent
-        role = prompt.data.get('role', '')
-        task = prompt.data.get('task', '')
-
-        criteria.clear_intent = bool(role and task and len(task.split()) > 5)
-
-        # Check for specific constraints
-        constraints = prompt.execution.get('constraints', [])
-        criteria.specific_constraints = len(constraints) >= 2
-
-        # Check for easy parsing (well-defined output format)
-        output_format = prompt.execution.get('output_format', {})
-        criteria.easy_parsing = bool(output_format and len(output_format) > 0)
-
-        # Check for ambiguities (heuristic)
-        ambiguous_words = ['maybe', 'possibly', 'might', 'could', 'perhaps', 'somehow']
-        task_lower = task.lower()
-        criteria.no_ambiguities = not any(word in task_lower for word in ambiguous_words)
-
-        # Check for proper structure
-        has_role = bool(role)
-        has_task = bool(task)
-        has_context = bool(prompt.data.get('context'))
-        has_output = bool(output_format)
-
-        criteria.proper_structure = sum([has_role, has_task, has_context, has_output]) >= 3
-
-        # Calculate overall score
-        scores = [
-            criteria.clear_intent,
-            criteria.specific_constraints,
-            criteria.easy_parsing,
-            criteria.no_ambiguities,
-            criteria.proper_structure
-        ]
-        criteria.score = sum(scores) / len(scores)
-
-        return criteria
+        return RefinementCriteria(*_score_criteria(
+            bool(prompt.data.get('role', '')),
+            prompt.data.get('task', ''),
+            len(prompt.execution.get('constraints', [])),
+            bool(prompt.execution.get('output_format', {})),
+            bool(prompt.data.get('context'))
+        ))
 
     def _identify_improvements(
         self,
@@ -190,28 +318,14 @@ class RefinementEngine:
         Returns:
             List of improvement descriptions
         """
-        improvements = []
-
-        if not criteria.clear_intent:
-            improvements.append("clarify_intent")
-            improvements.append("Enhance role definition and task description for clarity")
-
-        if not criteria.specific_constraints:
-            improvements.append("add_constraints")
-            improvements.append("Add specific constraints and requirements")
-
-        if not criteria.easy_parsing:
-            improvements.append("define_output_format")
-            improvements.append("Define clear output format specification")
-
-        if not criteria.no_ambiguities:
-            improvements.append("remove_ambiguities")
-            improvements.append("Remove ambiguous language and add specificity")
-
-        if not criteria.proper_structure:
-            improvements.append("improve_structure")
-            improvements.append("Enhance overall prompt structure")
+        missing = ~criteria.flags & ALL_CRITERIA
+        if not missing:
+            return []
 
+        improvements = []
+        for bit, (tag, description, _) in enumerate(IMPROVEMENTS):
+            if missing >> bit & 1:
+                improvements += (tag, description)
         return improvements
 
     def _apply_improvements(
@@ -227,87 +341,33 @@ class RefinementEngine:
             improvements: List of improvements to apply
 
         Returns:
-            Improved PromptComponent
+            Improved PromptComponent, or the same prompt if nothing changed
         """
-        refinements = {
-            "data": prompt.data.copy(),
-            "execution": prompt.execution.copy(),
-            "reason": f"Applied {len(improvements)} improvements"
-        }
+        # Writes land in the overlay maps; the prompt's dicts are only read
+        data = ChainMap({}, prompt.data)
+        execution = ChainMap({}, prompt.execution)
 
-        # Apply specific improvements
+        # Apply specific improvements; descriptions have no handler
         for improvement in improvements:
-            if improvement == "clarify_intent":
-                # Enhance role if too brief
-                if len(refinements["data"].get("role", "")) < 20:
-                    current_role = refinements["data"].get("role", "professional assistant")
-                    refinements["data"]["role"] = f"an expert {current_role} specializing in prompt engineering"
-
-                # Enhance task if too brief
-                if len(refinements["data"].get("task", "")) < 30:
-                    current_task = refinements["data"].get("task", "")
-                    refinements["data"]["task"] = f"{current_task}. Ensure the output is clear, accurate, and comprehensive."
-
-            elif improvement == "add_constraints":
-                current_constraints = refinements["execution"].get("constraints", [])
-                if len(current_constraints) < 2:
-                    default_constraints = [
-                        "Ensure output is well-formatted and easy to read",
-                        "Provide complete and accurate information",
-                        "Maintain professional tone throughout"
-                    ]
-                    refinements["execution"]["constraints"] = current_constraints + default_constraints
-
-            elif improvement == "define_output_format":
-                if not refinements["execution"].get("output_format"):
-                    refinements["execution"]["output_format"] = {
-                        "type": "structured",
-                        "format": "text",
-                        "sections": ["main_content", "summary"]
-                    }
-
-            elif improvement == "remove_ambiguities":
-                # Replace ambiguous words with definitive language
-                task = refinements["data"].get("task", "")
-                ambiguous_replacements = {
-                    "maybe": "specifically",
-                    "possibly": "definitely",
-                    "might": "will",
-                    "could": "should",
-                    "perhaps": "certainly",
-                    "somehow": "by using"
-                }
-                for ambiguous, definite in ambiguous_replacements.items():
-                    task = task.replace(ambiguous, definite)
-                refinements["data"]["task"] = task
-
-            elif improvement == "improve_structure":
-                # Ensure all key components exist
-                if not refinements["data"].get("context"):
-                    refinements["data"]["context"] = {
-                        "purpose": "general prompt engineering",
-                        "target": "AI language model"
-                    }
-
-        # Create refined component
-        from dxtag_manager import DxTagManager
-        manager = DxTagManager()
-
-        new_component = PromptComponent(
-            data=refinements["data"],
-            execution=refinements["execution"],
-            tags=prompt.tags.copy(),
-            version=prompt.version,
+            handler = _IMPROVEMENT_HANDLERS.get(improvement)
+            if handler is not None:
+                handler(data, execution)
+
+        if not data.maps[0] and not execution.maps[0]:
+            return prompt
+
+        # Create refined component, incrementing the version as a minor change
+        # Refinement never edits tags, so the new version shares the dict, as
+        # DxTagManager's stored versions already do
+        major, minor, patch = prompt.version.split('.', 2)
+        return PromptComponent(
+            data={**prompt.data, **data.maps[0]},
+            execution={**prompt.execution, **execution.maps[0]},
+            tags=prompt.tags,
+            version=f"{major}.{int(minor) + 1}.{patch}",
             component_id=prompt.component_id
         )
 
-        # Increment version as minor change
-        version_parts = new_component.version.split('.')
-        version_parts[1] = str(int(version_parts[1]) + 1)
-        new_component.version = '.'.join(version_parts)
-
-        return new_component
-
     def _update_improvement_patterns(self, iterations: List[RefinementIteration]):
         """
         Updates learning patterns based on refinement iterations
@@ -315,14 +375,13 @@ class RefinementEngine:
         Args:
             iterations: List of refinement iterations
         """
-        for iteration in iterations:
-            for improvement in iteration.improvements:
-                # Extract improvement type (first word)
-                if isinstance(improvement, str):
-                    improvement_type = improvement.split()[0] if ' ' in improvement else improvement
-                    if improvement_type not in self.improvement_patterns:
-                        self.improvement_patterns[improvement_type] = 0
-                    self.improvement_patterns[improvement_type] += 1
+        # Count each improvement by type (its first word)
+        self.improvement_patterns.update(
+            improvement.partition(' ')[0]
+            for iteration in iterations
+            for improvement in iteration.improvements
+            if isinstance(improvement, str)
+        )
 
     def get_common_improvements(self, top_n: int = 5) -> List[Tuple[str, int]]:
         """
@@ -334,12 +393,7 @@ class RefinementEngine:
         Returns:
             List of (improvement_type, count) tuples
         """
-        sorted_patterns = sorted(
-            self.improvement_patterns.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )
-        return sorted_patterns[:top_n]
+        return self.improvement_patterns.most_common(top_n)
 
     def should_iterate_again(
         self,
@@ -388,21 +442,21 @@ class RefinementEngine:
                 "common_improvements": []
             }
 
+        # Group iterations by refine() call; a call may have stopped after one
+        runs: Dict[int, List[RefinementIteration]] = {}
+        for iteration in self.refinement_history:
+            runs.setdefault(iteration.refinement_id, []).append(iteration)
+
         # Calculate average score improvement
         improvements = []
-        for i in range(0, len(self.refinement_history), 2):
-            if i + 1 < len(self.refinement_history):
-                first = self.refinement_history[i]
-                second = self.refinement_history[i + 1]
-                # Compare original from first to final from second
-                original_score = self._evaluate_prompt(first.original_prompt).score
-                final_score = self._evaluate_prompt(second.refined_prompt).score
-                improvements.append(final_score - original_score)
+        for run in runs.values():
+            # Compare original from the first iteration to final from the last
+            improvements.append(run[-1].refined_score - run[0].original_score)
 
         avg_improvement = sum(improvements) / len(improvements) if improvements else 0.0
 
         return {
-            "total_refinements": len(self.refinement_history) // 2,
+            "total_refinements": len(runs),
             "total_iterations": len(self.refinement_history),
             "average_score_improvement": avg_improvement,
             "common_improvements": self.get_common_improvements()
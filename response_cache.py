@@ -0,0 +1,413 @@
+"""
+Response Cache Module
+Exact-match and semantic LLM response caches with disk persistence
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from hashing import fingerprint
+from serialization import JSONDecodeError, dumpb, read_json, write_json
+
+
+class LLMResponseCache:
+    """
+    In-memory LRU cache of generated responses, persisted to a JSON file
+
+    Entries expire after their TTL. Writes to disk are batched: the file is
+    rewritten at most once per persist interval, from a background thread so
+    the caller (typically the event loop) never blocks on disk I/O, and
+    synchronously on an explicit flush().
+    """
+
+    def __init__(
+        self,
+        path: str = ".cache/prompt_cache.json",
+        max_entries: int = 1024,
+        default_ttl: float = 86400.0,
+        persist_interval: float = 30.0
+    ):
+        """
+        Initialize response cache
+
+        Args:
+            path: JSON file used to persist entries across restarts
+            max_entries: Maximum number of entries kept (least recently used evicted)
+            default_ttl: Default time-to-live in seconds
+            persist_interval: Minimum seconds between disk writes
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.persist_interval = persist_interval
+        self.hits = 0
+        self.misses = 0
+
+        # key -> (expires_at, value), ordered least to most recently used
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._dirty = False
+        self._last_persist = 0.0
+        # Snapshots are numbered so a slow background write never replaces
+        # a newer file; the lock keeps writes one at a time
+        self._snapshots = 0
+        self._written = 0
+        self._write_lock = threading.Lock()
+
+        self._load()
+
+    @staticmethod
+    def make_key(**parts: Any) -> str:
+        """
+        Builds a cache key from the inputs that determine a response
+
+        Args:
+            **parts: Named inputs (text, style, model, ...)
+
+        Returns:
+            Hex fingerprint of the canonicalized inputs
+        """
+        return fingerprint(dumpb(parts, sort_keys=True))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Gets a cached value
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if missing or expired
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            self._dirty = True
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: Optional[float] = None):
+        """
+        Stores a value
+
+        Args:
+            key: Cache key
+            value: JSON-serializable value
+            ttl: Time-to-live in seconds (defaults to default_ttl)
+        """
+        expires_at = time.time() + (self.default_ttl if ttl is None else ttl)
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+        self._dirty = True
+        self._maybe_persist()
+
+    def delete(self, key: str):
+        """Removes a single entry"""
+        if self._entries.pop(key, None) is not None:
+            self._dirty = True
+            self._maybe_persist()
+
+    def clear(self):
+        """Removes all entries and resets statistics"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self._dirty = True
+        self.flush()
+
+    def flush(self):
+        """Writes pending changes to disk, waiting for any background write"""
+        self._write(self._snapshot())
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Gets cache statistics
+
+        Returns:
+            Dictionary with size, hits, misses and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _maybe_persist(self):
+        """Writes to disk in the background if the persist interval has elapsed"""
+        if time.monotonic() - self._last_persist < self.persist_interval:
+            return
+
+        snapshot = self._snapshot()
+        if snapshot is not None:
+            threading.Thread(target=self._write, args=(snapshot,), name="cache-persist", daemon=True).start()
+
+    def _snapshot(self) -> Optional[Tuple[int, List[list]]]:
+        """
+        Captures the unexpired entries to write and marks the cache clean
+
+        Runs on the caller's thread, so the entries are never read while
+        another thread is changing them.
+
+        Returns:
+            Tuple of (snapshot number, rows), or None if nothing changed
+        """
+        if not self._dirty:
+            return None
+
+        now = time.time()
+        rows = [
+            [key, expires_at, value]
+            for key, (expires_at, value) in self._entries.items()
+            if expires_at >= now
+        ]
+        self._snapshots += 1
+        self._dirty = False
+        self._last_persist = time.monotonic()
+        return self._snapshots, rows
+
+    def _write(self, snapshot: Optional[Tuple[int, List[list]]]):
+        """Writes a snapshot unless a newer one already reached the disk"""
+        with self._write_lock:
+            if snapshot is None or snapshot[0] <= self._written:
+                return
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            write_json(self.path, snapshot[1], indent=False)
+            self._written = snapshot[0]
+
+    def _load(self):
+        """Loads unexpired entries from disk, oldest first"""
+        if not self.path.exists():
+            return
+
+        try:
+            rows = read_json(self.path)
+        except (JSONDecodeError, OSError):
+            # Ignore a corrupted cache file; it is rewritten on next flush
+            return
+
+        now = time.time()
+        for key, expires_at, value in rows[-self.max_entries:]:
+            if expires_at >= now:
+                self._entries[key] = (expires_at, value)
+        self._last_persist = time.monotonic()
+
+
+class SemanticPromptCache:
+    """
+    Nearest-neighbour cache over embeddings of previously answered inputs
+
+    Inputs are embedded with a local sentence-transformer; a lookup returns
+    the stored response of the most similar prior input when its cosine
+    similarity reaches the threshold. Entries belong to a partition (e.g.
+    output style) and only match lookups in the same partition, and expire
+    after their TTL. numpy and sentence-transformers are optional and
+    imported on first use.
+    """
+
+    def __init__(
+        self,
+        path: str = ".cache/semantic",
+        model_name: str = "all-MiniLM-L6-v2",
+        threshold: float = 0.92,
+        max_entries: int = 10000,
+        default_ttl: float = 86400.0
+    ):
+        """
+        Initialize semantic cache
+
+        Args:
+            path: Path prefix for the persisted vectors (.npy) and entries (.json)
+            model_name: sentence-transformers model used for embeddings
+            threshold: Minimum cosine similarity for a hit
+            max_entries: Maximum number of entries kept (oldest overwritten)
+            default_ttl: Default time-to-live in seconds
+        """
+        self.path = Path(path)
+        self.model_name = model_name
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._model = None
+        self._vectors = None  # np.ndarray [max_entries, dim], normalized rows
+        self._expires = None  # np.ndarray [max_entries], expiry timestamps
+        self._partition_ids = None  # np.ndarray [max_entries], index into _partitions
+        self._partitions: List[str] = []
+        self._entries: list = []
+        self._next = 0  # ring-buffer slot for the next insertion
+        self._dirty = False
+        self._last_encoded: Tuple[Optional[str], Any] = (None, None)
+        # lookup/add run in worker threads; guards the model and ring buffer
+        self._lock = threading.Lock()
+
+    def lookup(self, text: str, partition: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Finds the stored response for the most similar prior input
+
+        Args:
+            text: Input text
+            partition: Only entries stored under this partition can match
+
+        Returns:
+            Cached value with its "similarity", or None below threshold
+        """
+        with self._lock:
+            query = self._encode(text)
+            count = len(self._entries)
+            if not count or partition not in self._partitions:
+                self.misses += 1
+                return None
+
+            sims = self._vectors[:count] @ query
+            live = (
+                (self._partition_ids[:count] == self._partitions.index(partition))
+                & (self._expires[:count] >= time.time())
+            )
+            sims[~live] = -1.0
+            best = int(sims.argmax())
+            similarity = float(sims[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return {**self._entries[best], "similarity": similarity}
+
+    def add(
+        self,
+        text: str,
+        value: Dict[str, Any],
+        partition: str = "",
+        ttl: Optional[float] = None
+    ):
+        """
+        Stores a response under the embedding of its input
+
+        Args:
+            text: Input text
+            value: JSON-serializable value
+            partition: Partition the entry is visible to
+            ttl: Time-to-live in seconds (defaults to default_ttl)
+        """
+        with self._lock:
+            vector = self._encode(text)
+            if partition not in self._partitions:
+                self._partitions.append(partition)
+
+            slot = self._next
+            self._vectors[slot] = vector
+            self._expires[slot] = time.time() + (self.default_ttl if ttl is None else ttl)
+            self._partition_ids[slot] = self._partitions.index(partition)
+            if slot < len(self._entries):
+                self._entries[slot] = value
+            else:
+                self._entries.append(value)
+            self._next = (slot + 1) % self.max_entries
+            self._dirty = True
+
+    def flush(self):
+        """Writes vectors and entries to disk if anything changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+
+            import numpy as np
+
+            count = len(self._entries)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            np.save(self.path.with_suffix(".npy"), self._vectors[:count])
+            write_json(self.path.with_suffix(".json"), {
+                "model": self.model_name,
+                "next": self._next,
+                "partitions": self._partitions,
+                "partition_ids": self._partition_ids[:count].tolist(),
+                "expires": self._expires[:count].tolist(),
+                "entries": self._entries
+            }, indent=False)
+            self._dirty = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        Gets cache statistics
+
+        Returns:
+            Dictionary with size, hits, misses and hit rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+    def _encode(self, text: str):
+        """Embeds text as a normalized vector, loading the model on first use"""
+        # A miss is followed by add() for the same text; reuse that embedding
+        last_text, last_vector = self._last_encoded
+        if text == last_text:
+            return last_vector
+
+        if self._model is None:
+            self._load()
+        vector = self._model.encode(text, normalize_embeddings=True)
+        self._last_encoded = (text, vector)
+        return vector
+
+    def _load(self):
+        """Loads the embedding model and any persisted entries"""
+        import numpy as np
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(self.model_name)
+        dim = self._model.get_sentence_embedding_dimension()
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._expires = np.zeros(self.max_entries, dtype=np.float64)
+        self._partition_ids = np.zeros(self.max_entries, dtype=np.int32)
+
+        vectors_file = self.path.with_suffix(".npy")
+        entries_file = self.path.with_suffix(".json")
+        if not (vectors_file.exists() and entries_file.exists()):
+            return
+
+        try:
+            data = read_json(entries_file)
+            stored = np.load(vectors_file)
+        except (JSONDecodeError, OSError, ValueError):
+            return
+
+        if data.get("model") != self.model_name or stored.shape[1:] != (dim,):
+            return
+        if "expires" not in data:
+            # Written before entries were partitioned; start over
+            return
+
+        count = min(len(data["entries"]), len(stored), self.max_entries)
+        self._vectors[:count] = stored[:count]
+        self._expires[:count] = data["expires"][:count]
+        self._partition_ids[:count] = data["partition_ids"][:count]
+        self._partitions = data["partitions"]
+        self._entries = data["entries"][:count]
+        self._next = data.get("next", count) % self.max_entries
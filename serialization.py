@@ -0,0 +1,100 @@
+"""
+Serialization Module
+JSON encoding and decoding with an orjson fast path and stdlib fallback
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+# catch this one name regardless of the active backend
+JSONDecodeError = json.JSONDecodeError
+
+
+def dumps(obj: Any, indent: bool = False, sort_keys: bool = False) -> str:
+    """
+    Serializes an object to a JSON string
+
+    Args:
+        obj: Object to serialize
+        indent: Whether to pretty-print with two-space indentation
+        sort_keys: Whether to sort dictionary keys
+
+    Returns:
+        JSON string
+    """
+    return dumpb(obj, indent=indent, sort_keys=sort_keys).decode()
+
+
+def dumpb(obj: Any, indent: bool = False, sort_keys: bool = False) -> bytes:
+    """
+    Serializes an object to UTF-8 encoded JSON bytes
+
+    Args:
+        obj: Object to serialize
+        indent: Whether to pretty-print with two-space indentation
+        sort_keys: Whether to sort dictionary keys
+
+    Returns:
+        JSON bytes
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, option=option)
+
+    return json.dumps(
+        obj,
+        indent=2 if indent else None,
+        sort_keys=sort_keys,
+        ensure_ascii=False
+    ).encode()
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Deserializes a JSON string or bytes
+
+    Args:
+        data: JSON document
+
+    Returns:
+        Deserialized object
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def write_json(path: Union[str, Path], obj: Any, indent: bool = True):
+    """
+    Writes an object to a JSON file in a single write
+
+    Args:
+        path: Destination file path
+        obj: Object to serialize
+        indent: Whether to pretty-print the file
+    """
+    Path(path).write_bytes(dumpb(obj, indent=indent))
+
+
+def read_json(path: Union[str, Path]) -> Any:
+    """
+    Reads a JSON file
+
+    Args:
+        path: Source file path
+
+    Returns:
+        Deserialized object
+    """
+    return loads(Path(path).read_bytes())
@@ -8,10 +8,13 @@ Implements the five-step cognitive framework for prompt engineering:
 5. Context management
 """
 
-from typing import Dict, List, Any, Optional
+import re
+from itertools import chain
+from typing import Dict, List, Any, FrozenSet, Optional, Sequence, Set, Tuple, Union
 from dataclasses import dataclass, field
 from datetime import datetime
-import json
+
+_WORD_RE = re.compile(r"[a-z]+")
 
 
 @dataclass
@@ -25,58 +28,153 @@ class ThinkingResult:
     timestamp: str = field(default_factory=lambda: datetime.now().isoformat())
 
 
+@dataclass(frozen=True, slots=True)
+class PreparedInput:
+    """Input text with the derived forms the thinking modes read, computed once"""
+    text: str
+    lower: str
+    words: Tuple[str, ...]
+    word_set: FrozenSet[str]  # lowercase alphabetic tokens
+    preview: str  # leading 100 characters, quoted in analysis headers
+
+    @classmethod
+    def of(cls, text: Union[str, "PreparedInput"]) -> "PreparedInput":
+        """
+        Prepares raw text, passing already prepared input through
+
+        Args:
+            text: Raw input text or a PreparedInput
+
+        Returns:
+            PreparedInput for the text
+        """
+        if isinstance(text, PreparedInput):
+            return text
+        lower = text.lower()
+        return cls(
+            text=text,
+            lower=lower,
+            words=tuple(text.split()),
+            word_set=frozenset(_WORD_RE.findall(lower)),
+            preview=text[:100]
+        )
+
+
+def _indicator_pattern(indicators: Sequence[str]) -> "re.Pattern[str]":
+    """
+    Compiles an indicator list into a single-pass substring matcher
+
+    The alternation sits in a zero-width lookahead, so findall() tests every
+    position and reports each indicator occurring anywhere in the text, the
+    same as one `in` check per indicator. No indicator may be a prefix of
+    another in the same list, as only one alternative matches per position.
+
+    Args:
+        indicators: Lowercase indicator strings
+
+    Returns:
+        Compiled pattern
+    """
+    return re.compile("(?=(" + "|".join(map(re.escape, indicators)) + "))")
+
+
+WordIndicators = Tuple[FrozenSet[str], Optional["re.Pattern[str]"]]
+
+
+def _word_indicators(indicators: Sequence[str]) -> WordIndicators:
+    """
+    Splits an indicator list into whole-word and phrase matchers
+
+    Purely alphabetic indicators are matched against the input's word set;
+    phrases and anything else ("agent-to-agent") go into one substring
+    pattern.
+
+    Args:
+        indicators: Lowercase indicator strings
+
+    Returns:
+        Tuple of (single-word set, phrase pattern or None)
+    """
+    phrases = [indicator for indicator in indicators if not indicator.isalpha()]
+    return (
+        frozenset(indicator for indicator in indicators if indicator.isalpha()),
+        _indicator_pattern(phrases) if phrases else None
+    )
+
+
+def _find_words(indicators: WordIndicators, prepared: PreparedInput) -> Set[str]:
+    """Returns the set of word and phrase indicators present in prepared input"""
+    words, phrases = indicators
+    found = set(words & prepared.word_set)
+    if phrases is not None:
+        found.update(phrases.findall(prepared.lower))
+    return found
+
+
 class LogicalThinking:
     """
     Establishes cause-and-effect relationships and identifies contradictions
     """
 
+    CREATION_WORDS = ("create", "generate", "write", "make")
+    CONTRADICTION_PAIRS = (("not", "but"), ("however", "although"), ("except", "only"))
+
+    _CREATION = frozenset(CREATION_WORDS)
+
     @staticmethod
-    def analyze(input_text: str, context: Optional[Dict] = None) -> ThinkingResult:
+    def analyze(
+        input_text: Union[str, PreparedInput],
+        context: Optional[Dict] = None,
+        timestamp: Optional[str] = None
+    ) -> ThinkingResult:
         """
         Analyzes input using logical reasoning
 
         Args:
-            input_text: The raw input to analyze
+            input_text: The raw input to analyze, or a PreparedInput of it
             context: Optional context from previous interactions
+            timestamp: ISO timestamp for the result (defaults to now)
 
         Returns:
             ThinkingResult with logical analysis
         """
+        prepared = PreparedInput.of(input_text)
+        input_text, word_set = prepared.text, prepared.word_set
         insights = []
         recommendations = []
 
-        # Analyze for logical structure
-        analysis = f"Logical Analysis of: '{input_text[:100]}...'\n\n"
-
         # Check for clear intent
         if "?" in input_text:
             insights.append("Input contains questions - requires clarification structure")
             recommendations.append("Structure prompt to address each question systematically")
-        elif any(word in input_text.lower() for word in ["create", "generate", "write", "make"]):
+        elif not LogicalThinking._CREATION.isdisjoint(word_set):
             insights.append("Input is a creation request - requires clear output specifications")
             recommendations.append("Define explicit success criteria and output format")
 
         # Check for contradictions
-        contradiction_keywords = [("not", "but"), ("however", "although"), ("except", "only")]
-        for pair in contradiction_keywords:
-            if pair[0] in input_text.lower() and pair[1] in input_text.lower():
+        for pair in LogicalThinking.CONTRADICTION_PAIRS:
+            if pair[0] in word_set and pair[1] in word_set:
                 insights.append(f"Potential contradiction detected: '{pair[0]}' and '{pair[1]}'")
                 recommendations.append("Clarify relationship between conflicting requirements")
 
         # Check for completeness
-        if len(input_text.split()) < 5:
+        if len(prepared.words) < 5:
             insights.append("Input is very brief - likely missing context")
             recommendations.append("Request additional context: target audience, constraints, format")
 
-        analysis += f"Identified {len(insights)} logical patterns\n"
-        analysis += f"Generated {len(recommendations)} recommendations"
+        analysis = (
+            f"Logical Analysis of: '{prepared.preview}...'\n\n"
+            f"Identified {len(insights)} logical patterns\n"
+            f"Generated {len(recommendations)} recommendations"
+        )
 
         return ThinkingResult(
             thinking_type="logical",
             analysis=analysis,
             insights=insights,
             recommendations=recommendations,
-            metadata={"word_count": len(input_text.split())}
+            metadata={"word_count": len(prepared.words)},
+            timestamp=timestamp or datetime.now().isoformat()
         )
 
 
@@ -85,23 +183,37 @@ class AnalyticalThinking:
     Breaks down complex requests into constituent components
     """
 
+    ACTION_VERBS = ("create", "generate", "write", "analyze", "summarize", "explain", "build")
+    CONSTRAINT_INDICATORS = ("must", "should", "cannot", "within", "limit", "maximum", "minimum")
+    CONTEXT_INDICATORS = ("for", "about", "regarding", "concerning", "in the context of")
+    FORMAT_INDICATORS = ("format", "style", "structure", "template", "json", "markdown")
+
+    _ACTION = _word_indicators(ACTION_VERBS)
+    _CONSTRAINT = _word_indicators(CONSTRAINT_INDICATORS)
+    _CONTEXT = _word_indicators(CONTEXT_INDICATORS)
+    _FORMAT = _word_indicators(FORMAT_INDICATORS)
+
     @staticmethod
-    def analyze(input_text: str, context: Optional[Dict] = None) -> ThinkingResult:
+    def analyze(
+        input_text: Union[str, PreparedInput],
+        context: Optional[Dict] = None,
+        timestamp: Optional[str] = None
+    ) -> ThinkingResult:
         """
         Analyzes input by breaking it into components
 
         Args:
-            input_text: The raw input to analyze
+            input_text: The raw input to analyze, or a PreparedInput of it
             context: Optional context from previous interactions
+            timestamp: ISO timestamp for the result (defaults to now)
 
         Returns:
             ThinkingResult with analytical breakdown
         """
+        prepared = PreparedInput.of(input_text)
         insights = []
         recommendations = []
 
-        analysis = f"Analytical Breakdown of: '{input_text[:100]}...'\n\n"
-
         # Identify components
         components = {
             "action": None,
@@ -112,9 +224,9 @@ class AnalyticalThinking:
         }
 
         # Extract action verbs
-        action_verbs = ["create", "generate", "write", "analyze", "summarize", "explain", "build"]
-        for verb in action_verbs:
-            if verb in input_text.lower():
+        found = _find_words(AnalyticalThinking._ACTION, prepared)
+        for verb in AnalyticalThinking.ACTION_VERBS:
+            if verb in found:
                 components["action"] = verb
                 insights.append(f"Primary action identified: {verb}")
                 break
@@ -124,9 +236,9 @@ class AnalyticalThinking:
             recommendations.append("Add explicit action verb (e.g., 'create', 'analyze', 'generate')")
 
         # Check for constraints
-        constraint_indicators = ["must", "should", "cannot", "within", "limit", "maximum", "minimum"]
-        for indicator in constraint_indicators:
-            if indicator in input_text.lower():
+        found = _find_words(AnalyticalThinking._CONSTRAINT, prepared)
+        for indicator in AnalyticalThinking.CONSTRAINT_INDICATORS:
+            if indicator in found:
                 components["constraints"].append(indicator)
                 insights.append(f"Constraint indicator found: '{indicator}'")
 
@@ -134,30 +246,35 @@ class AnalyticalThinking:
             recommendations.append("Consider adding explicit constraints or requirements")
 
         # Check for context clues
-        context_indicators = ["for", "about", "regarding", "concerning", "in the context of"]
-        for indicator in context_indicators:
-            if indicator in input_text.lower():
+        found = _find_words(AnalyticalThinking._CONTEXT, prepared)
+        for indicator in AnalyticalThinking.CONTEXT_INDICATORS:
+            if indicator in found:
                 components["context"].append(indicator)
 
         # Check for output format specifications
-        format_indicators = ["format", "style", "structure", "template", "json", "markdown"]
-        for indicator in format_indicators:
-            if indicator in input_text.lower():
+        found = _find_words(AnalyticalThinking._FORMAT, prepared)
+        for indicator in AnalyticalThinking.FORMAT_INDICATORS:
+            if indicator in found:
                 components["output_format"] = indicator
                 insights.append(f"Output format specified: {indicator}")
 
         if not components["output_format"]:
             recommendations.append("Specify desired output format (e.g., JSON, markdown, plain text)")
 
-        analysis += f"Components identified: {len([v for v in components.values() if v])}/5\n"
-        analysis += f"Completeness score: {(len([v for v in components.values() if v]) / 5) * 100:.0f}%"
+        identified = sum(1 for v in components.values() if v)
+        analysis = (
+            f"Analytical Breakdown of: '{prepared.preview}...'\n\n"
+            f"Components identified: {identified}/5\n"
+            f"Completeness score: {(identified / 5) * 100:.0f}%"
+        )
 
         return ThinkingResult(
             thinking_type="analytical",
             analysis=analysis,
             insights=insights,
             recommendations=recommendations,
-            metadata={"components": components}
+            metadata={"components": components},
+            timestamp=timestamp or datetime.now().isoformat()
         )
 
 
@@ -166,23 +283,37 @@ class ComputationalThinking:
     Translates abstract concepts into structured, executable patterns
     """
 
+    SEQUENTIAL_INDICATORS = ("first", "then", "next", "finally", "step")
+    CONDITIONAL_INDICATORS = ("if", "when", "unless", "in case", "depending on")
+    ITERATIVE_INDICATORS = ("each", "every", "all", "multiple", "repeat", "loop")
+    PARALLEL_INDICATORS = ("simultaneously", "at the same time", "parallel", "concurrent")
+
+    _SEQUENTIAL = _word_indicators(SEQUENTIAL_INDICATORS)
+    _CONDITIONAL = _word_indicators(CONDITIONAL_INDICATORS)
+    _ITERATIVE = _word_indicators(ITERATIVE_INDICATORS)
+    _PARALLEL = _word_indicators(PARALLEL_INDICATORS)
+
     @staticmethod
-    def analyze(input_text: str, context: Optional[Dict] = None) -> ThinkingResult:
+    def analyze(
+        input_text: Union[str, PreparedInput],
+        context: Optional[Dict] = None,
+        timestamp: Optional[str] = None
+    ) -> ThinkingResult:
         """
         Analyzes input for computational structure
 
         Args:
-            input_text: The raw input to analyze
+            input_text: The raw input to analyze, or a PreparedInput of it
             context: Optional context from previous interactions
+            timestamp: ISO timestamp for the result (defaults to now)
 
         Returns:
             ThinkingResult with computational analysis
         """
+        prepared = PreparedInput.of(input_text)
         insights = []
         recommendations = []
 
-        analysis = f"Computational Analysis of: '{input_text[:100]}...'\n\n"
-
         # Identify computational patterns
         patterns = {
             "sequential": False,
@@ -192,29 +323,25 @@ class ComputationalThinking:
         }
 
         # Check for sequential processing
-        sequential_indicators = ["first", "then", "next", "finally", "step"]
-        if any(ind in input_text.lower() for ind in sequential_indicators):
+        if _find_words(ComputationalThinking._SEQUENTIAL, prepared):
             patterns["sequential"] = True
             insights.append("Sequential processing pattern detected")
             recommendations.append("Structure prompt with clear step-by-step instructions")
 
         # Check for conditional logic
-        conditional_indicators = ["if", "when", "unless", "in case", "depending on"]
-        if any(ind in input_text.lower() for ind in conditional_indicators):
+        if _find_words(ComputationalThinking._CONDITIONAL, prepared):
             patterns["conditional"] = True
             insights.append("Conditional logic detected")
             recommendations.append("Clearly define all conditional branches and edge cases")
 
         # Check for iteration
-        iterative_indicators = ["each", "every", "all", "multiple", "repeat", "loop"]
-        if any(ind in input_text.lower() for ind in iterative_indicators):
+        if _find_words(ComputationalThinking._ITERATIVE, prepared):
             patterns["iterative"] = True
             insights.append("Iterative processing pattern detected")
             recommendations.append("Specify iteration criteria and termination conditions")
 
         # Check for parallel processing
-        parallel_indicators = ["simultaneously", "at the same time", "parallel", "concurrent"]
-        if any(ind in input_text.lower() for ind in parallel_indicators):
+        if _find_words(ComputationalThinking._PARALLEL, prepared):
             patterns["parallel"] = True
             insights.append("Parallel processing pattern detected")
             recommendations.append("Define dependencies and synchronization points")
@@ -228,15 +355,19 @@ class ComputationalThinking:
         elif active_patterns >= 2:
             complexity = "medium"
 
-        analysis += f"Computational patterns: {active_patterns}/4 active\n"
-        analysis += f"Algorithmic complexity: {complexity}"
+        analysis = (
+            f"Computational Analysis of: '{prepared.preview}...'\n\n"
+            f"Computational patterns: {active_patterns}/4 active\n"
+            f"Algorithmic complexity: {complexity}"
+        )
 
         return ThinkingResult(
             thinking_type="computational",
             analysis=analysis,
             insights=insights,
             recommendations=recommendations,
-            metadata={"patterns": patterns, "complexity": complexity}
+            metadata={"patterns": patterns, "complexity": complexity},
+            timestamp=timestamp or datetime.now().isoformat()
         )
 
 
@@ -245,23 +376,37 @@ class ProducerThinking:
     Focuses on practical end results and consumption patterns
     """
 
+    AUDIENCE_INDICATORS = ("for users", "for developers", "for customers", "for agents", "audience")
+    USE_CASE_INDICATORS = ("to help", "to enable", "to solve", "for the purpose of")
+    METRIC_INDICATORS = ("accurate", "fast", "comprehensive", "concise", "clear", "detailed")
+    CONSUMPTION_INDICATORS = ("api", "command line", "web", "mobile", "agent-to-agent")
+
+    _AUDIENCE = _word_indicators(AUDIENCE_INDICATORS)
+    _USE_CASE = _word_indicators(USE_CASE_INDICATORS)
+    _METRIC = _word_indicators(METRIC_INDICATORS)
+    _CONSUMPTION = _word_indicators(CONSUMPTION_INDICATORS)
+
     @staticmethod
-    def analyze(input_text: str, context: Optional[Dict] = None) -> ThinkingResult:
+    def analyze(
+        input_text: Union[str, PreparedInput],
+        context: Optional[Dict] = None,
+        timestamp: Optional[str] = None
+    ) -> ThinkingResult:
         """
         Analyzes input for end-result focus
 
         Args:
-            input_text: The raw input to analyze
+            input_text: The raw input to analyze, or a PreparedInput of it
             context: Optional context from previous interactions
+            timestamp: ISO timestamp for the result (defaults to now)
 
         Returns:
             ThinkingResult with producer analysis
         """
+        prepared = PreparedInput.of(input_text)
         insights = []
         recommendations = []
 
-        analysis = f"Producer Analysis of: '{input_text[:100]}...'\n\n"
-
         # Identify output characteristics
         output_analysis = {
             "target_audience": None,
@@ -271,9 +416,9 @@ class ProducerThinking:
         }
 
         # Check for target audience
-        audience_indicators = ["for users", "for developers", "for customers", "for agents", "audience"]
-        for indicator in audience_indicators:
-            if indicator in input_text.lower():
+        found = _find_words(ProducerThinking._AUDIENCE, prepared)
+        for indicator in ProducerThinking.AUDIENCE_INDICATORS:
+            if indicator in found:
                 output_analysis["target_audience"] = indicator
                 insights.append(f"Target audience identified: {indicator}")
                 break
@@ -282,17 +427,17 @@ class ProducerThinking:
             recommendations.append("Specify target audience for the output")
 
         # Check for use case
-        use_case_indicators = ["to help", "to enable", "to solve", "for the purpose of"]
-        for indicator in use_case_indicators:
-            if indicator in input_text.lower():
+        found = _find_words(ProducerThinking._USE_CASE, prepared)
+        for indicator in ProducerThinking.USE_CASE_INDICATORS:
+            if indicator in found:
                 output_analysis["use_case"] = indicator
                 insights.append(f"Use case identified: {indicator}")
                 break
 
         # Check for success metrics
-        metric_indicators = ["accurate", "fast", "comprehensive", "concise", "clear", "detailed"]
-        for indicator in metric_indicators:
-            if indicator in input_text.lower():
+        found = _find_words(ProducerThinking._METRIC, prepared)
+        for indicator in ProducerThinking.METRIC_INDICATORS:
+            if indicator in found:
                 output_analysis["success_metrics"].append(indicator)
 
         if output_analysis["success_metrics"]:
@@ -301,9 +446,9 @@ class ProducerThinking:
             recommendations.append("Define success criteria (e.g., accuracy, speed, comprehensiveness)")
 
         # Check for consumption method
-        consumption_indicators = ["api", "command line", "web", "mobile", "agent-to-agent"]
-        for indicator in consumption_indicators:
-            if indicator in input_text.lower():
+        found = _find_words(ProducerThinking._CONSUMPTION, prepared)
+        for indicator in ProducerThinking.CONSUMPTION_INDICATORS:
+            if indicator in found:
                 output_analysis["consumption_method"] = indicator
                 insights.append(f"Consumption method: {indicator}")
                 break
@@ -319,15 +464,20 @@ class ProducerThinking:
         if viability_score < 0.5:
             recommendations.append("Add more details about intended use and success criteria")
 
-        analysis += f"Output specification completeness: {viability_score*100:.0f}%\n"
-        analysis += f"Production readiness: {'High' if viability_score >= 0.75 else 'Medium' if viability_score >= 0.5 else 'Low'}"
+        readiness = 'High' if viability_score >= 0.75 else 'Medium' if viability_score >= 0.5 else 'Low'
+        analysis = (
+            f"Producer Analysis of: '{prepared.preview}...'\n\n"
+            f"Output specification completeness: {viability_score*100:.0f}%\n"
+            f"Production readiness: {readiness}"
+        )
 
         return ThinkingResult(
             thinking_type="producer",
             analysis=analysis,
             insights=insights,
             recommendations=recommendations,
-            metadata={"output_analysis": output_analysis, "viability_score": viability_score}
+            metadata={"output_analysis": output_analysis, "viability_score": viability_score},
+            timestamp=timestamp or datetime.now().isoformat()
         )
 
 
@@ -342,47 +492,62 @@ class MultiDimensionalThinking:
         self.computational = ComputationalThinking()
         self.producer = ProducerThinking()
 
-    def analyze_all(self, input_text: str, context: Optional[Dict] = None) -> Dict[str, ThinkingResult]:
+    def analyze_all(
+        self,
+        input_text: str,
+        context: Optional[Dict] = None,
+        timestamp: Optional[str] = None
+    ) -> Dict[str, ThinkingResult]:
         """
         Runs all four thinking modes in parallel
 
         Args:
             input_text: The raw input to analyze
             context: Optional context from previous interactions
+            timestamp: ISO timestamp shared by all four results (defaults to now)
 
         Returns:
             Dictionary mapping thinking type to results
         """
-        results = {
-            "logical": self.logical.analyze(input_text, context),
-            "analytical": self.analytical.analyze(input_text, context),
-            "computational": self.computational.analyze(input_text, context),
-            "producer": self.producer.analyze(input_text, context)
+        prepared = PreparedInput.of(input_text)
+        timestamp = timestamp or datetime.now().isoformat()
+        modes = {
+            "logical": self.logical,
+            "analytical": self.analytical,
+            "computational": self.computational,
+            "producer": self.producer
         }
+        return {name: mode.analyze(prepared, context, timestamp) for name, mode in modes.items()}
 
-        return results
-
-    def synthesize(self, results: Dict[str, ThinkingResult]) -> Dict[str, Any]:
+    def synthesize(
+        self,
+        results: Dict[str, ThinkingResult],
+        timestamp: Optional[str] = None
+    ) -> Dict[str, Any]:
         """
         Synthesizes insights from all thinking modes
 
         Args:
             results: Dictionary of thinking results
+            timestamp: ISO timestamp for the synthesis (defaults to now)
 
         Returns:
             Synthesized analysis with combined insights
         """
-        all_insights = []
-        all_recommendations = []
-
-        for thinking_type, result in results.items():
-            all_insights.extend([f"[{thinking_type.upper()}] {i}" for i in result.insights])
-            all_recommendations.extend([f"[{thinking_type.upper()}] {r}" for r in result.recommendations])
+        prefixes = {thinking_type: f"[{thinking_type.upper()}] " for thinking_type in results}
+        all_insights = list(chain.from_iterable(
+            (prefixes[thinking_type] + i for i in result.insights)
+            for thinking_type, result in results.items()
+        ))
+        all_recommendations = list(chain.from_iterable(
+            (prefixes[thinking_type] + r for r in result.recommendations)
+            for thinking_type, result in results.items()
+        ))
 
         return {
             "total_insights": len(all_insights),
             "total_recommendations": len(all_recommendations),
             "insights": all_insights,
             "recommendations": all_recommendations,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": timestamp or datetime.now().isoformat()
         }